@@ -0,0 +1,142 @@
+import argparse
+import json
+import sys
+import uuid
+
+import numpy as np
+import torch
+from PIL import Image
+
+from core.detect.scene import SceneDetector
+from core.embed.clip import get_clip_model
+from core.embed.face import FaceEmbedder
+from core.loader.image_loader import ImageLoader
+from core.types import ImageData
+from types_ import InferenceBackend
+
+TEXTS = ["a dog playing on the beach", "birthday party with friends", "snowy mountain at sunset"]
+LOGIT_TOLERANCE = 1e-2
+MIN_AGREEMENT = 1.0
+MIN_COSINE = 0.999
+
+
+def load_images(path: str | None, n_images: int, seed: int) -> list[ImageData]:
+    if path:
+        loader = ImageLoader(images=path, auto_load=True)
+        return [image for _, image in loader.iter()][:n_images]
+
+    rng = np.random.default_rng(seed)
+    return [
+        ImageData(
+            id=uuid.uuid4(),
+            image=Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)),
+            meta={"size": (640, 480)},
+        )
+        for _ in range(n_images)
+    ]
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=-1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=-1, keepdims=True)
+    return (a * b).sum(axis=-1)
+
+
+def scene_parity(images: list[ImageData], backend: InferenceBackend) -> dict:
+    eager, exported = SceneDetector(), SceneDetector(backend=backend)
+    batch = torch.stack([SceneDetector.preprocess(image) for image in images])
+    expected = eager.forward(batch).detach().numpy()
+    actual = exported.forward(batch).detach().numpy()
+
+    labels_eager = eager.detect_batch(images, with_return=True)
+    labels_exported = exported.detect_batch(images, with_return=True)
+    return {
+        "max_abs_logit_diff": float(np.abs(expected - actual).max()),
+        "top1_agreement": float((expected.argmax(1) == actual.argmax(1)).mean()),
+        "label_agreement": float(
+            np.mean(
+                [
+                    [label for label, _ in a] == [label for label, _ in b]
+                    for a, b in zip(labels_eager, labels_exported)  # type: ignore
+                ]
+            )
+        ),
+    }
+
+
+def face_parity(images: list[ImageData], backend: InferenceBackend) -> dict:
+    eager, exported = FaceEmbedder(), FaceEmbedder(backend=backend)
+    crops = [image.image.convert("RGB").resize((160, 160)) for image in images]
+    return {
+        "min_cosine": float(
+            cosine(eager.get_embeddings(crops), exported.get_embeddings(crops)).min()
+        )
+    }
+
+
+def clip_parity(images: list[ImageData], backend: InferenceBackend) -> dict:
+    eager, exported = get_clip_model(InferenceBackend.EAGER), get_clip_model(backend)
+    items = [image.image for image in images] + TEXTS
+    expected = np.stack([np.asarray(eager.encode(item)) for item in items])
+    actual = np.stack([np.asarray(exported.encode(item)) for item in items])
+    return {"min_cosine": float(cosine(expected, actual).min())}
+
+
+CHECKS = {"scene": scene_parity, "face": face_parity, "clip": clip_parity}
+BACKENDS = {
+    "scene": [InferenceBackend.ONNX, InferenceBackend.TORCHSCRIPT],
+    "face": [InferenceBackend.ONNX],
+    "clip": [InferenceBackend.ONNX, InferenceBackend.TORCHSCRIPT],
+}
+
+
+def passes(
+    result: dict,
+    logit_tolerance: float = LOGIT_TOLERANCE,
+    min_agreement: float = MIN_AGREEMENT,
+    min_cosine: float = MIN_COSINE,
+) -> bool:
+    if "top1_agreement" in result:
+        return (
+            result["max_abs_logit_diff"] <= logit_tolerance
+            and result["top1_agreement"] >= min_agreement
+            and result["label_agreement"] >= min_agreement
+        )
+    return result["min_cosine"] >= min_cosine
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that exported models match the eager models within tolerance"
+    )
+    parser.add_argument("--models", nargs="+", choices=list(CHECKS), default=list(CHECKS))
+    parser.add_argument("--images", type=str, default=None, help="Directory of sample photos")
+    parser.add_argument("--n-images", type=int, default=8)
+    parser.add_argument("--logit-tolerance", type=float, default=LOGIT_TOLERANCE)
+    parser.add_argument("--min-agreement", type=float, default=MIN_AGREEMENT)
+    parser.add_argument("--min-cosine", type=float, default=MIN_COSINE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.n_images, args.seed)
+    results = []
+    for model in args.models:
+        for backend in BACKENDS[model]:
+            result = {"model": model, "backend": backend.value, **CHECKS[model](images, backend)}
+            result["passed"] = passes(
+                result, args.logit_tolerance, args.min_agreement, args.min_cosine
+            )
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if not all(result["passed"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import json
+import time
+import uuid
+
+import numpy as np
+
+from core.cluster.community_detection import CommunityDetector
+from core.cluster.knn_community_detection import KNNCommunityDetector
+from core.cluster.neighbours import IVFNeighbourIndex
+
+
+def synthetic_faces(n_faces: int, faces_per_person: int, dim: int, noise: float, seed: int):
+    rng = np.random.default_rng(seed)
+    n_persons = max(1, n_faces // faces_per_person)
+    persons = rng.standard_normal((n_persons, dim)).astype(np.float32)
+    persons /= np.linalg.norm(persons, axis=1, keepdims=True)
+
+    labels = rng.integers(0, n_persons, n_faces)
+    embeddings = persons[labels] + noise * rng.standard_normal((n_faces, dim)).astype(
+        np.float32
+    ) / np.sqrt(dim)
+    ids = [uuid.UUID(int=int(i)) for i in rng.integers(0, 2**63, n_faces)]
+    face_ids = [f"face_{i}" for i in range(n_faces)]
+    return ids, face_ids, list(embeddings), labels
+
+
+def score_clusters(clusters, face_ids: list[str], labels: np.ndarray) -> dict:
+    rows = {face_id: row for row, face_id in enumerate(face_ids)}
+    clustered = 0
+    correct = 0
+    for cluster in clusters:
+        cluster_labels = labels[[rows[face_id] for _, face_id in cluster]]
+        clustered += len(cluster_labels)
+        correct += np.bincount(cluster_labels).max()
+    return {
+        "clusters": len(clusters),
+        "coverage": clustered / len(labels),
+        "purity": correct / clustered if clustered else 0.0,
+    }
+
+
+def run(args) -> list[dict]:
+    results = []
+    for n_faces in args.sizes:
+        ids, face_ids, embeddings, labels = synthetic_faces(
+            n_faces, args.faces_per_person, args.dim, args.noise, args.seed
+        )
+        detectors = {
+            "ann": KNNCommunityDetector(
+                index=IVFNeighbourIndex(n_probe=args.n_probe),
+                n_neighbours=args.neighbours,
+                threshold=args.threshold,
+            )
+        }
+        if n_faces <= args.exact_max:
+            detectors["exact"] = CommunityDetector(
+                threshold=args.threshold, block_size=args.block_size
+            )
+
+        for backend, detector in detectors.items():
+            start = time.perf_counter()
+            detector.fit_embeddings(ids, face_ids, embeddings)
+            elapsed = time.perf_counter() - start
+
+            result = {"backend": backend, "faces": n_faces, "seconds": round(elapsed, 3)}
+            result.update(score_clusters(detector.clusters, face_ids, labels))
+            results.append(result)
+            print(json.dumps(result))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare exact and ANN face clustering")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000, 100_000, 500_000]
+    )
+    parser.add_argument("--exact-max", type=int, default=50_000)
+    parser.add_argument("--faces-per-person", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--threshold", type=float, default=0.72)
+    parser.add_argument("--neighbours", type=int, default=32)
+    parser.add_argument("--n-probe", type=int, default=16)
+    parser.add_argument("--block-size", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
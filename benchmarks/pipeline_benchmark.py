@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from itertools import cycle
+from typing import Any, Callable, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from core.cluster.community_detection import CommunityDetector
+from core.detect.face import FaceDetector
+from core.detect.object import ObjectDetector
+from core.detect.scene import SceneDetector
+from core.embed.face import FaceEmbedder
+from core.loader.image_loader import ImageLoader
+from core.registry import registry
+from core.types import ImageData
+from db.config import Entity
+from models import Photo, User
+from settings import Settings
+from types_ import DatastoreType
+
+STAGES = ["loader", "faces", "embed", "objects", "scene", "cluster", "end_to_end"]
+
+
+def draw_face(draw: ImageDraw.ImageDraw, rng: np.random.Generator, width: int, height: int):
+    size = int(rng.integers(min(width, height) // 8, min(width, height) // 3))
+    x = int(rng.integers(0, width - size))
+    y = int(rng.integers(0, height - size))
+    skin = tuple(int(c) for c in rng.integers([170, 120, 90], [255, 200, 170]))
+    draw.ellipse([x, y, x + size, y + int(size * 1.25)], fill=skin)
+    eye = max(size // 10, 2)
+    for ex in (x + size // 3, x + 2 * size // 3):
+        draw.ellipse(
+            [ex - eye, y + size // 2 - eye, ex + eye, y + size // 2 + eye], fill=(30, 30, 30)
+        )
+    draw.arc(
+        [x + size // 3, y + size // 2, x + 2 * size // 3, y + size], 20, 160, fill=(120, 40, 40)
+    )
+
+
+def synthetic_photos(
+    out_dir: str,
+    n_images: int,
+    size: tuple[int, int],
+    faces: int,
+    fixtures: Optional[str],
+    seed: int,
+) -> list[str]:
+    paths = []
+    if fixtures:
+        # Real photos give realistic face and object counts, they are cycled to reach n_images
+        sources = sorted(os.path.join(fixtures, name) for name in os.listdir(fixtures))
+        for source, _ in zip(cycle(sources), range(n_images)):
+            path = os.path.join(out_dir, f"{uuid.uuid4()}{os.path.splitext(source)[1]}")
+            shutil.copyfile(source, path)
+            paths.append(path)
+        return paths
+
+    rng = np.random.default_rng(seed)
+    width, height = size
+    for _ in range(n_images):
+        top, bottom = rng.integers(0, 256, (2, 3))
+        gradient = np.linspace(top, bottom, height)[:, None, :].repeat(width, axis=1)
+        image = Image.fromarray(gradient.astype(np.uint8))
+        draw = ImageDraw.Draw(image)
+        for _ in range(int(rng.integers(3, 12))):
+            x0, x1 = sorted(rng.integers(0, width, 2))
+            y0, y1 = sorted(rng.integers(0, height, 2))
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            shape = draw.rectangle if rng.random() < 0.5 else draw.ellipse
+            shape([x0, y0, x1, y1], fill=color)
+        for _ in range(faces):
+            draw_face(draw, rng, width, height)
+
+        path = os.path.join(out_dir, f"{uuid.uuid4()}.jpg")
+        image.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+def summarize(latencies: list[float], wall: float) -> dict[str, Any]:
+    return {
+        "images": len(latencies),
+        "seconds": wall,
+        "images_per_sec": len(latencies) / wall if wall else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000) if latencies else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95) * 1000) if latencies else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def time_per_item(func: Callable[[Any], Any], items: list, warmup: int) -> dict[str, Any]:
+    # Warm-up calls load the models through the registry so load time is not counted
+    for item in items[:warmup]:
+        func(item)
+
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        item_start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - item_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def time_per_batch(
+    func: Callable[[list], Any], items: list, batch_size: int, warmup: int
+) -> dict[str, Any]:
+    batches = [items[start : start + batch_size] for start in range(0, len(items), batch_size)]
+    if warmup:
+        func(batches[0])
+
+    # Each image in a batch is charged an equal share, matching how the runners call the models
+    latencies = []
+    start = time.perf_counter()
+    for batch in batches:
+        batch_start = time.perf_counter()
+        func(batch)
+        latencies.extend([(time.perf_counter() - batch_start) / len(batch)] * len(batch))
+    return {**summarize(latencies, time.perf_counter() - start), "batch_size": batch_size}
+
+
+def load_images(paths: list[str], max_side: Optional[int]) -> dict[uuid.UUID, ImageData]:
+    loader = ImageLoader(paths, auto_load=True, max_side=max_side)
+    images = dict(loader.iter())
+    # PIL decodes lazily, force it so the loader stage measures the actual decode
+    for image in images.values():
+        image.image.load()
+    return images
+
+
+def mongo_connections(photos: list[Photo]) -> Optional[dict]:
+    try:
+        import mongomock
+    except ImportError:
+        return None
+
+    import db.mongo_connect as mongo_connect
+
+    # Every connection shares one in-memory client so photo updates find the inserted photos
+    client = mongomock.MongoClient()
+    mongo_connect.MongoClient = lambda *args, **kwargs: client
+    connections = {
+        entity: mongo_connect.MongoConnection(entity) for entity in (Entity.PERSON, Entity.PHOTO)
+    }
+    connections[Entity.PHOTO].insert_many([photo.model_dump(mode="json") for photo in photos])
+    return connections
+
+
+def end_to_end(paths: list[str], args) -> dict[str, Any]:
+    from pipeline.multi_task_runner import MultiTaskRunner
+
+    user = User(id=uuid.uuid4(), name="benchmark", email="benchmark@example.com", password="")
+    photos = [
+        Photo(
+            id=uuid.UUID(os.path.splitext(os.path.basename(path))[0]),
+            uri=path,
+            datastore=DatastoreType.LOCAL,
+            owner_id=user.id,
+        )
+        for path in paths
+    ]
+    runner = MultiTaskRunner()
+    kwargs = dict(
+        num_workers=args.num_workers,
+        batch_size=args.batch_size,
+        embed_batch_size=args.embed_batch_size,
+        decode_max_side=args.decode_max_side,
+        threshold=args.threshold,
+    )
+
+    start = time.perf_counter()
+    task_results = runner.task(paths, photos=photos, user=user, **kwargs)
+    processed = time.perf_counter() - start
+
+    write_back: dict[str, Any] = {"backend": args.write_back, "skipped": None}
+    if args.write_back == "mongo":
+        connections = mongo_connections(photos)
+        if connections is None:
+            write_back["skipped"] = "mongomock is not installed, pip install mongomock"
+            print(f"WARNING: write-back skipped, {write_back['skipped']}", file=sys.stderr)
+        else:
+            write_start = time.perf_counter()
+            runner.update_collections(task_results, connections)
+            write_back["seconds"] = time.perf_counter() - write_start
+    else:
+        write_back["skipped"] = "disabled with --write-back none"
+
+    seconds = time.perf_counter() - start
+    return {
+        "images": len(paths),
+        "seconds": seconds,
+        "images_per_sec": len(paths) / seconds,
+        # Stages run batched and in parallel, so only the mean time per photo is meaningful
+        "mean_ms": processed / len(paths) * 1000,
+        "write_back": write_back,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    out_dir = tempfile.mkdtemp(prefix="picwiz-bench-")
+    try:
+        paths = synthetic_photos(
+            out_dir, args.n_images, tuple(args.size), args.faces, args.fixtures, args.seed
+        )
+
+        if "loader" in args.stages:
+            results["loader"] = time_per_item(
+                lambda path: load_images([path], args.decode_max_side), paths, 0
+            )
+        images = list(load_images(paths, args.decode_max_side).values())
+        inference = Settings().inference
+        embedder = FaceEmbedder(backend=inference.face, precision=inference.precision)
+
+        def embed_batch(batch: list[ImageData]):
+            embedder.extract_and_embed_batch(batch, batch_size=args.embed_batch_size)
+
+        if "faces" in args.stages:
+            # RetinaFace has no batched entry point, the runners also detect one image at a time
+            results["faces"] = time_per_item(FaceDetector().detect, images, args.warmup)
+        if "embed" in args.stages:
+            # Faces detected in the previous stage are reused, only cropping and FaceNet are timed
+            results["embed"] = time_per_batch(embed_batch, images, args.batch_size, args.warmup)
+        if "objects" in args.stages:
+            object_detector = ObjectDetector()
+            results["objects"] = time_per_batch(
+                lambda batch: object_detector.detect_batch(batch, batch_size=len(batch)),
+                images,
+                args.batch_size,
+                args.warmup,
+            )
+        if "scene" in args.stages:
+            detector = SceneDetector(backend=inference.scene, precision=inference.precision)
+            results["scene"] = time_per_batch(
+                lambda batch: detector.detect_batch(batch, batch_size=len(batch)),
+                images,
+                args.batch_size,
+                args.warmup,
+            )
+        if "cluster" in args.stages:
+            if "embed" not in args.stages:
+                for start in range(0, len(images), args.batch_size):
+                    embed_batch(images[start : start + args.batch_size])
+            n_faces = sum(len(image.faces) for image in images)
+            detector = CommunityDetector(threshold=args.threshold, min_community_size=2)
+            start = time.perf_counter()
+            detector.fit({image.id: image for image in images})
+            seconds = time.perf_counter() - start
+            results["cluster"] = {
+                "faces": n_faces,
+                "communities": len(detector.clusters),
+                "seconds": seconds,
+                "faces_per_sec": n_faces / seconds if seconds else 0.0,
+                "peak_rss_mb": peak_rss_mb(),
+            }
+        if "end_to_end" in args.stages:
+            results["end_to_end"] = end_to_end(paths, args)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    return {
+        "revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "inference": Settings().inference.dict(),
+        "stages": results,
+        "models": registry.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inference pipeline offline")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--n-images", type=int, default=64)
+    parser.add_argument("--size", type=int, nargs=2, default=[1600, 1200], help="Width height")
+    parser.add_argument(
+        "--faces",
+        type=int,
+        default=2,
+        help="Cartoon faces drawn per synthetic photo, RetinaFace may not detect all of them",
+    )
+    parser.add_argument(
+        "--fixtures", type=str, default=None, help="Directory of real photos to use instead"
+    )
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument(
+        "--batch-size", type=int, default=8, help="Images per call to the batched model stages"
+    )
+    parser.add_argument(
+        "--embed-batch-size", type=int, default=64, help="Face crops per Facenet512 forward pass"
+    )
+    parser.add_argument("--decode-max-side", type=int, default=None)
+    parser.add_argument("--threshold", type=float, default=0.72)
+    parser.add_argument(
+        "--write-back",
+        choices=["mongo", "none"],
+        default="mongo",
+        help="Write end-to-end results to an in-memory mongomock database",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default="pipeline_benchmark.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report["stages"], indent=4))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
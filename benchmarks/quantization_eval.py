@@ -0,0 +1,108 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.backend_parity import cosine, load_images
+from core.detect.scene import SceneDetector
+from core.embed.face import FaceEmbedder
+from core.types import ImageData
+from types_ import InferenceBackend, InferencePrecision
+
+
+def throughput(forward, batch, n_items: int, repeats: int) -> float:
+    forward(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        forward(batch)
+    return n_items * repeats / (time.perf_counter() - start)
+
+
+def eval_scene(images: list[ImageData], backend: InferenceBackend, repeats: int) -> dict:
+    fp32 = SceneDetector(backend=backend)
+    int8 = SceneDetector(backend=backend, precision=InferencePrecision.INT8)
+    batch = torch.stack([SceneDetector.preprocess(image) for image in images])
+
+    with torch.no_grad():
+        expected = torch.softmax(fp32.forward(batch), 1).numpy()
+        actual = torch.softmax(int8.forward(batch), 1).numpy()
+        fp32_rate = throughput(fp32.forward, batch, len(images), repeats)
+        int8_rate = throughput(int8.forward, batch, len(images), repeats)
+
+    labels_fp32 = fp32.detect_batch(images, with_return=True)
+    labels_int8 = int8.detect_batch(images, with_return=True)
+    return {
+        "fp32_images_per_sec": fp32_rate,
+        "int8_images_per_sec": int8_rate,
+        "speedup": int8_rate / fp32_rate,
+        "top1_agreement": float((expected.argmax(1) == actual.argmax(1)).mean()),
+        "label_agreement": float(
+            np.mean(
+                [
+                    [label for label, _ in a] == [label for label, _ in b]
+                    for a, b in zip(labels_fp32, labels_int8)  # type: ignore
+                ]
+            )
+        ),
+        "max_abs_prob_diff": float(np.abs(expected - actual).max()),
+    }
+
+
+def eval_face(images: list[ImageData], backend: InferenceBackend, repeats: int) -> dict:
+    fp32 = FaceEmbedder(backend=backend)
+    int8 = FaceEmbedder(backend=backend, precision=InferencePrecision.INT8)
+    crops = [image.image.convert("RGB").resize((160, 160)) for image in images]
+
+    similarity = cosine(fp32.get_embeddings(crops), int8.get_embeddings(crops))
+    fp32_rate = throughput(fp32.get_embeddings, crops, len(crops), repeats)
+    int8_rate = throughput(int8.get_embeddings, crops, len(crops), repeats)
+    return {
+        "fp32_faces_per_sec": fp32_rate,
+        "int8_faces_per_sec": int8_rate,
+        "speedup": int8_rate / fp32_rate,
+        "mean_cosine": float(similarity.mean()),
+        "min_cosine": float(similarity.min()),
+    }
+
+
+EVALS = {"scene": eval_scene, "face": eval_face}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare INT8 quantised models against fp32 on a sample set"
+    )
+    parser.add_argument("--models", nargs="+", choices=list(EVALS), default=list(EVALS))
+    parser.add_argument(
+        "--backend",
+        choices=[backend.value for backend in InferenceBackend],
+        default=InferenceBackend.ONNX.value,
+    )
+    parser.add_argument("--images", type=str, default=None, help="Directory of sample photos")
+    parser.add_argument("--n-images", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    backend = InferenceBackend(args.backend)
+    images = load_images(args.images, args.n_images, args.seed)
+    results = []
+    for model in args.models:
+        result = {
+            "model": model,
+            "backend": backend.value,
+            **EVALS[model](images, backend, args.repeats),
+        }
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
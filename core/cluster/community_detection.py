@@ -1,16 +1,26 @@
+from typing import Optional
+
 import numpy as np
 import uuid
-from sentence_transformers import util
 from core.types import ImageData
 
 
 class CommunityDetector:
     def __init__(
-        self, threshold: float = 0.7, min_community_size: int = 2, init_max_size: int = 10
+        self,
+        threshold: float = 0.7,
+        min_community_size: int = 2,
+        init_max_size: int = 10,
+        merge_threshold: float = 0.7,
+        block_size: Optional[int] = None,
     ):
         self.threshold = threshold
         self.min_community_size = min_community_size
+        # Communities always hold every face above the threshold, init_max_size is kept
+        # for compatibility with the previous top-k based implementation
         self.init_max_size = init_max_size
+        self.merge_threshold = merge_threshold
+        self.block_size = block_size
 
         self.clusters = []
         self.centroids = []
@@ -25,121 +35,135 @@ class CommunityDetector:
                 embeddings.append(face_data["embedding"].flatten())
                 face_ids.append(face_id)
 
-        cos_scores = util.cos_sim(embeddings, embeddings)
+        self.fit_embeddings(ids, face_ids, embeddings)
 
-        top_k_values, _ = cos_scores.topk(k=self.min_community_size, largest=True)
+    def fit_embeddings(
+        self, ids: list[uuid.UUID], face_ids: list[str], embeddings: list[np.ndarray]
+    ):
+        if not embeddings:
+            self.clusters = []
+            self.centroids = []
+            return
 
-        extracted_communities = []
-        for i in range(len(top_k_values)):
-            if top_k_values[i][-1] >= self.threshold:
-                new_cluster = []
+        vectors = np.stack([np.asarray(e, dtype=np.float32).flatten() for e in embeddings])
+        normalized = self._normalize(vectors)
 
-                top_val_large, top_idx_large = cos_scores[i].topk(
-                    k=self.init_max_size, largest=True
-                )
-                top_idx_large = top_idx_large.tolist()
-                top_val_large = top_val_large.tolist()
+        communities = self._extract_communities(normalized)
+        communities = self._unique_communities(communities, len(vectors))
+        clusters = self._merge_communities(communities, vectors)
 
-                if top_val_large[-1] < self.threshold:
-                    for idx, val in zip(top_idx_large, top_val_large):
-                        if val < self.threshold:
-                            break
+        self.centroids = [vectors[cluster].mean(axis=0) for cluster in clusters]
+        self.clusters = self._best_face_per_photo(
+            ids, face_ids, normalized, clusters, self.centroids
+        )
 
-                        new_cluster.append(idx)
-                else:
-                    for idx, val in enumerate(cos_scores[i].tolist()):
-                        if val >= self.threshold:
-                            new_cluster.append(idx)
+    def fit_predict(self, image_data_list: dict[uuid.UUID, ImageData]):
+        self.fit(image_data_list)
+        return self.clusters
 
-                extracted_communities.append(new_cluster)
+    def predict(self, image_data_list: dict[uuid.UUID, ImageData]):
+        return self.fit_predict(image_data_list)
 
-        extracted_communities = sorted(extracted_communities, key=lambda x: len(x), reverse=True)
+    def _blocks(self, n: int):
+        block_size = self.block_size or n
+        for start in range(0, n, block_size):
+            yield start, min(start + block_size, n)
 
+    def _extract_communities(self, normalized: np.ndarray) -> list[np.ndarray]:
+        communities = []
+        seen = set()
+        for start, end in self._blocks(len(normalized)):
+            mask = normalized[start:end] @ normalized.T >= self.threshold
+            counts = mask.sum(axis=1)
+            seeds = np.flatnonzero(counts >= self.min_community_size)
+            if len(seeds) == 0:
+                continue
+
+            _, members = np.nonzero(mask[seeds])
+            for community in np.split(members, np.cumsum(counts[seeds])[:-1]):
+                key = community.tobytes()
+                if key not in seen:
+                    seen.add(key)
+                    communities.append(community)
+
+        return communities
+
+    def _unique_communities(self, communities: list[np.ndarray], n: int) -> list[np.ndarray]:
+        order = sorted(range(len(communities)), key=lambda i: len(communities[i]), reverse=True)
+
+        taken = np.zeros(n, dtype=bool)
         unique_communities = []
-        extracted_ids = set()
-
-        for community in extracted_communities:
-            add_cluster = True
-            for idx in community:
-                if idx in extracted_ids:
-                    add_cluster = False
-                    break
-
-            if add_cluster:
+        for i in order:
+            community = communities[i]
+            if not taken[community].any():
                 unique_communities.append(community)
-                for idx in community:
-                    extracted_ids.add(idx)
-
-        cluster_embeddings = []
-        for cluster in unique_communities:
-            temp = []
-            for c in cluster:
-                temp.append(embeddings[c])
-            cluster_embeddings.append(temp)
-
-        cluster_centroids = []
-        for cluster in cluster_embeddings:
-            cluster_centroids.append(np.mean(cluster, axis=0))
-
-        similar_centroid_map = {}
-        for i, c in enumerate(cluster_centroids):
-            temp = []
-            for j, c2 in enumerate(cluster_centroids):
-                if i != j:
-                    temp.append((j, util.cos_sim(c, c2)[0][0].item()))
-            temp = sorted(temp, key=lambda x: x[1], reverse=True)
-            similar_centroid_map[i] = temp[:3]
+                taken[community] = True
+
+        return unique_communities
+
+    def _merge_communities(
+        self, communities: list[np.ndarray], vectors: np.ndarray
+    ) -> list[np.ndarray]:
+        if len(communities) < 2:
+            return communities
+
+        centroids = self._normalize(np.stack([vectors[c].mean(axis=0) for c in communities]))
+        top_k = min(3, len(communities) - 1)
+
+        nearest = np.empty((len(centroids), top_k), dtype=np.int64)
+        nearest_scores = np.empty((len(centroids), top_k), dtype=np.float32)
+        for start, end in self._blocks(len(centroids)):
+            scores = centroids[start:end] @ centroids.T
+            scores[np.arange(end - start), np.arange(start, end)] = -np.inf
+            candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            order = np.argsort(-candidate_scores, axis=1, kind="stable")
+            nearest[start:end] = np.take_along_axis(candidates, order, axis=1)
+            nearest_scores[start:end] = np.take_along_axis(candidate_scores, order, axis=1)
 
         new_clusters = []
-        threshold = 0.7
         seen = set()
-        for i, c in enumerate(cluster_centroids):
-            for j, sim in similar_centroid_map[i]:
-                if sim > threshold and j not in seen:
-                    new_clusters.append(unique_communities[i] + unique_communities[j])
+        for i in range(len(communities)):
+            for j, score in zip(nearest[i].tolist(), nearest_scores[i].tolist()):
+                if score > self.merge_threshold and j not in seen:
+                    new_clusters.append(np.concatenate([communities[i], communities[j]]))
                     seen.add(j)
                     seen.add(i)
             if i not in seen:
-                new_clusters.append(unique_communities[i])
-
-        new_centroids = []
-        for cluster in new_clusters:
-            temp = []
-            for c in cluster:
-                temp.append(embeddings[c])
-            new_centroids.append(np.mean(temp, axis=0))
-
-        self.centroids = new_centroids
-
-        cluster_index_transforms = []
-        for idx, cluster in enumerate(new_clusters):
-            temp = dict()
-            for c in cluster:
-                if ids[c] not in temp:
-                    temp[ids[c]] = {
-                        "face_id": face_ids[c],
-                        "embedding": embeddings[c],
-                    }
-                else:
-                    seem_emb = temp[ids[c]]["embedding"]
-                    curr_emb = embeddings[c]
-                    cluster_centr = new_centroids[idx]
-                    cos_sim_seem = util.cos_sim(seem_emb, cluster_centr)[0][0].item()
-                    cos_sim_curr = util.cos_sim(curr_emb, cluster_centr)[0][0].item()
-
-                    if cos_sim_curr > cos_sim_seem:
-                        temp[ids[c]] = {
-                            "face_id": face_ids[c],
-                            "embedding": embeddings[c],
-                        }
-            temp = [(k, v["face_id"]) for k, v in temp.items()]
-            cluster_index_transforms.append(temp)
-
-        self.clusters = cluster_index_transforms
-
-    def fit_predict(self, image_data_list: dict[uuid.UUID, ImageData]):
-        self.fit(image_data_list)
-        return self.clusters
-
-    def predict(self, image_data_list: dict[uuid.UUID, ImageData]):
-        return self.fit_predict(image_data_list)
+                new_clusters.append(communities[i])
+
+        return new_clusters
+
+    def _best_face_per_photo(
+        self,
+        ids: list[uuid.UUID],
+        face_ids: list[str],
+        normalized: np.ndarray,
+        clusters: list[np.ndarray],
+        centroids: list[np.ndarray],
+    ) -> list[list[tuple[uuid.UUID, str]]]:
+        photo_index: dict[uuid.UUID, int] = {}
+        photo_codes = np.array([photo_index.setdefault(id, len(photo_index)) for id in ids])
+
+        results = []
+        for members, centroid in zip(clusters, centroids):
+            scores = normalized[members] @ self._normalize(centroid[None, :])[0]
+            codes = photo_codes[members]
+
+            # Sort by photo then by descending score, ties keep the face seen first
+            order = np.lexsort((-scores, codes))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = codes[order][1:] != codes[order][:-1]
+            best = members[order[first]]
+
+            _, first_seen = np.unique(codes, return_index=True)
+            best = best[np.argsort(first_seen, kind="stable")]
+
+            results.append([(ids[i], face_ids[i]) for i in best.tolist()])
+
+        return results
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
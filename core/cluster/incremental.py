@@ -0,0 +1,110 @@
+import uuid
+from typing import Optional
+
+import numpy as np
+
+from core.cluster.community_detection import CommunityDetector
+from core.types import ImageData
+
+
+class IncrementalClusterer:
+    def __init__(
+        self,
+        match_threshold: float = 0.72,
+        threshold: float = 0.7,
+        min_community_size: int = 2,
+        init_max_size: int = 10,
+        block_size: Optional[int] = None,
+        community_detector: Optional[CommunityDetector] = None,
+    ):
+        self.match_threshold = match_threshold
+        self.community_detector = community_detector or CommunityDetector(
+            threshold=threshold,
+            min_community_size=min_community_size,
+            init_max_size=init_max_size,
+            block_size=block_size,
+        )
+
+        self.matches: dict[uuid.UUID, list[tuple[uuid.UUID, str]]] = {}
+        self.updated_centroids: dict[uuid.UUID, np.ndarray] = {}
+        self.counts: dict[uuid.UUID, int] = {}
+
+    @property
+    def clusters(self):
+        return self.community_detector.clusters
+
+    @property
+    def centroids(self):
+        return self.community_detector.centroids
+
+    def fit(
+        self,
+        image_data: dict[uuid.UUID, ImageData],
+        known_centroids: dict[uuid.UUID, np.ndarray],
+        known_counts: dict[uuid.UUID, int],
+    ):
+        ids = []
+        face_ids = []
+        embeddings = []
+        for id, data in image_data.items():
+            for face_id, face_data in data.faces.items():
+                ids.append(id)
+                face_ids.append(face_id)
+                embeddings.append(np.asarray(face_data["embedding"], dtype=np.float32).flatten())
+
+        self.matches = {}
+        self.updated_centroids = {}
+        self.counts = {}
+
+        leftovers = list(range(len(embeddings)))
+        if known_centroids and embeddings:
+            leftovers = self._match_known(ids, face_ids, embeddings, known_centroids, known_counts)
+
+        self.community_detector.fit_embeddings(
+            [ids[i] for i in leftovers],
+            [face_ids[i] for i in leftovers],
+            [embeddings[i] for i in leftovers],
+        )
+
+    def _match_known(
+        self,
+        ids: list[uuid.UUID],
+        face_ids: list[str],
+        embeddings: list[np.ndarray],
+        known_centroids: dict[uuid.UUID, np.ndarray],
+        known_counts: dict[uuid.UUID, int],
+    ) -> list[int]:
+        person_ids = list(known_centroids)
+        centroids = np.stack(
+            [np.asarray(known_centroids[p], dtype=np.float32).flatten() for p in person_ids]
+        )
+        faces = np.stack(embeddings)
+
+        normalize = CommunityDetector._normalize
+        similarities = normalize(faces) @ normalize(centroids).T
+        best = similarities.argmax(axis=1)
+        best_similarity = similarities[np.arange(len(faces)), best]
+
+        # A person appears at most once per photo, keep the closest face and leave the rest
+        order = np.argsort(-best_similarity, kind="stable")
+        matched = np.zeros(len(faces), dtype=bool)
+        seen = set()
+        for i in order[best_similarity[order] >= self.match_threshold]:
+            key = (ids[i], best[i])
+            if key not in seen:
+                seen.add(key)
+                matched[i] = True
+
+        for person_index in np.unique(best[matched]):
+            members = np.flatnonzero(matched & (best == person_index))
+            person_id = person_ids[person_index]
+            count = max(known_counts.get(person_id, 1), 1)
+
+            total = count + len(members)
+            centroid = centroids[person_index] * count + faces[members].sum(axis=0)
+
+            self.matches[person_id] = [(ids[i], face_ids[i]) for i in members]
+            self.updated_centroids[person_id] = centroid / total
+            self.counts[person_id] = total
+
+        return np.flatnonzero(~matched).tolist()
@@ -0,0 +1,80 @@
+import uuid
+from typing import Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from core.cluster.community_detection import CommunityDetector
+from core.cluster.neighbours import BaseNeighbourIndex, IVFNeighbourIndex
+
+
+class KNNCommunityDetector(CommunityDetector):
+    def __init__(
+        self,
+        index: Optional[BaseNeighbourIndex] = None,
+        n_neighbours: int = 32,
+        mutual: bool = True,
+        threshold: float = 0.7,
+        min_community_size: int = 2,
+        init_max_size: int = 10,
+        merge_threshold: float = 0.7,
+        block_size: Optional[int] = 4096,
+    ):
+        super().__init__(
+            threshold=threshold,
+            min_community_size=min_community_size,
+            init_max_size=init_max_size,
+            merge_threshold=merge_threshold,
+            block_size=block_size,
+        )
+        self.index = index or IVFNeighbourIndex(block_size=block_size or 4096)
+        self.n_neighbours = n_neighbours
+        self.mutual = mutual
+
+    def fit_embeddings(
+        self, ids: list[uuid.UUID], face_ids: list[str], embeddings: list[np.ndarray]
+    ):
+        if not embeddings:
+            self.clusters = []
+            self.centroids = []
+            return
+
+        vectors = np.stack([np.asarray(e, dtype=np.float32).flatten() for e in embeddings])
+        normalized = self._normalize(vectors)
+
+        self.index.build(normalized, ids, face_ids)
+        communities = self._extract_communities(normalized)
+        clusters = self._merge_communities(communities, vectors)
+
+        self.centroids = [vectors[cluster].mean(axis=0) for cluster in clusters]
+        self.clusters = self._best_face_per_photo(
+            ids, face_ids, normalized, clusters, self.centroids
+        )
+
+    def _extract_communities(self, normalized: np.ndarray) -> list[np.ndarray]:
+        n = len(normalized)
+        # The first neighbour of every face is usually the face itself
+        indices, scores = self.index.search(normalized, min(self.n_neighbours + 1, n))
+
+        rows = np.repeat(np.arange(n), indices.shape[1])
+        cols = indices.ravel()
+        keep = (cols >= 0) & (cols != rows) & (scores.ravel() >= self.threshold)
+        graph = csr_matrix(
+            (np.ones(int(keep.sum()), dtype=np.int8), (rows[keep], cols[keep])), shape=(n, n)
+        )
+        if self.mutual:
+            # Only keep edges both faces agree on, hub faces would otherwise chain identities
+            graph = graph.multiply(graph.T)
+
+        _, labels = connected_components(graph, directed=False)
+        sizes = np.bincount(labels)
+
+        order = np.argsort(labels, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        components = np.argsort(-sizes, kind="stable")
+
+        return [
+            order[bounds[label] : bounds[label + 1]]
+            for label in components[sizes[components] >= self.min_community_size]
+        ]
@@ -0,0 +1,169 @@
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+from qdrant_client import models
+
+from db import QdrantConnection
+from db.config import QdrantCollections
+
+
+class BaseNeighbourIndex(ABC):
+    @abstractmethod
+    def build(self, vectors: np.ndarray, ids: list[uuid.UUID], face_ids: list[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(self, vectors: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return (indices, scores) of shape (len(vectors), k), missing neighbours are -1."""
+        raise NotImplementedError
+
+
+class IVFNeighbourIndex(BaseNeighbourIndex):
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_probe: int = 16,
+        train_size: int = 16,
+        train_iterations: int = 10,
+        block_size: int = 4096,
+        seed: int = 0,
+    ):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        # k-means is trained on train_size sampled vectors per list
+        self.train_size = train_size
+        self.train_iterations = train_iterations
+        self.block_size = block_size
+        self.seed = seed
+
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.list_centroids = np.empty((0, 0), dtype=np.float32)
+        self.lists: list[np.ndarray] = []
+
+    def build(self, vectors: np.ndarray, ids: list[uuid.UUID], face_ids: list[str]):
+        rng = np.random.default_rng(self.seed)
+        n = len(vectors)
+        n_lists = min(self.n_lists or max(1, int(4 * np.sqrt(n))), n)
+
+        sample = vectors[rng.choice(n, min(n, n_lists * self.train_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(self.train_iterations):
+            assignment = self._nearest(sample, centroids, 1)[:, 0]
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=n_lists)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+            sums = sample[rng.choice(len(sample), n_lists)]
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            centroids = self._normalize(sums)
+
+        assignment = self._nearest(vectors, centroids, 1)[:, 0]
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+
+        self.vectors = vectors
+        self.list_centroids = centroids
+        self.lists = [order[bounds[i] : bounds[i + 1]] for i in range(n_lists)]
+
+    def search(self, vectors: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        n_probe = min(self.n_probe, len(self.lists))
+        probes = self._nearest(vectors, self.list_centroids, n_probe)
+
+        indices = np.full((len(vectors), k), -1, dtype=np.int64)
+        scores = np.full((len(vectors), k), -np.inf, dtype=np.float32)
+
+        queries = np.repeat(np.arange(len(vectors)), n_probe)
+        probed = probes.ravel()
+        order = np.argsort(probed, kind="stable")
+        bounds = np.searchsorted(probed[order], np.arange(len(self.lists) + 1))
+
+        for list_id, members in enumerate(self.lists):
+            list_queries = queries[order[bounds[list_id] : bounds[list_id + 1]]]
+            if len(members) == 0 or len(list_queries) == 0:
+                continue
+            for start in range(0, len(list_queries), self.block_size):
+                block = list_queries[start : start + self.block_size]
+                block_scores = vectors[block] @ self.vectors[members].T
+
+                candidate_idx = np.concatenate(
+                    [indices[block], np.broadcast_to(members, block_scores.shape)], axis=1
+                )
+                candidate_scores = np.concatenate([scores[block], block_scores], axis=1)
+                top = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+                indices[block] = np.take_along_axis(candidate_idx, top, axis=1)
+                scores[block] = np.take_along_axis(candidate_scores, top, axis=1)
+
+        return indices, scores
+
+    def _nearest(self, vectors: np.ndarray, centroids: np.ndarray, k: int) -> np.ndarray:
+        nearest = np.empty((len(vectors), k), dtype=np.int64)
+        for start in range(0, len(vectors), self.block_size):
+            scores = vectors[start : start + self.block_size] @ centroids.T
+            end = start + len(scores)
+            if k == 1:
+                nearest[start:end] = scores.argmax(axis=1)[:, None]
+            else:
+                nearest[start:end] = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        return nearest
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class QdrantNeighbourIndex(BaseNeighbourIndex):
+    def __init__(self, owner_id: uuid.UUID, batch_size: int = 256):
+        self.owner_id = owner_id
+        self.batch_size = batch_size
+        self.rows: dict[tuple[str, str], int] = {}
+
+    def build(self, vectors: np.ndarray, ids: list[uuid.UUID], face_ids: list[str]):
+        keys = [(str(id), face_id) for id, face_id in zip(ids, face_ids)]
+        self.rows = {key: row for row, key in enumerate(keys)}
+
+        # Point ids are derived from (photo, face) so re-running a library overwrites its points
+        with QdrantConnection(collection=QdrantCollections.FACENET_EMBEDDINGS) as conn:
+            for start in range(0, len(vectors), self.batch_size):
+                batch = keys[start : start + self.batch_size]
+                conn.upsert_many(
+                    [uuid.uuid5(uuid.UUID(photo_id), face_id) for photo_id, face_id in batch],
+                    [
+                        {"owner_id": str(self.owner_id), "photo_id": photo_id, "face_key": face_id}
+                        for photo_id, face_id in batch
+                    ],
+                    vectors[start : start + self.batch_size].tolist(),
+                )
+
+    def search(self, vectors: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        indices = np.full((len(vectors), k), -1, dtype=np.int64)
+        scores = np.full((len(vectors), k), -np.inf, dtype=np.float32)
+        owner_filter = models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="owner_id", match=models.MatchValue(value=str(self.owner_id))
+                )
+            ]
+        )
+
+        with QdrantConnection(collection=QdrantCollections.FACENET_EMBEDDINGS) as conn:
+            for start in range(0, len(vectors), self.batch_size):
+                results = conn.search_batch(
+                    vectors[start : start + self.batch_size].tolist(),
+                    top_k=k,
+                    threshold=None,
+                    query_filter=owner_filter,
+                )
+                for row, neighbours in enumerate(results, start=start):
+                    column = 0
+                    for neighbour in neighbours:
+                        index = self.rows.get((neighbour["photo_id"], neighbour["face_key"]))
+                        if index is not None:
+                            indices[row, column] = index
+                            scores[row, column] = neighbour["score"]
+                            column += 1
+
+        return indices, scores
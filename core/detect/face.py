@@ -1,15 +1,34 @@
 from typing import Any
-import numpy as np
 from retinaface import RetinaFace
 
 from core.detect.base import BaseDetector
+from core.registry import registry
 from core.types import ImageData
 
+MODEL_NAME = "retinaface"
+
+registry.register(MODEL_NAME, RetinaFace.build_model)
+
 
 class FaceDetector(BaseDetector):
     def detect(self, image_data: ImageData, with_return: bool = False) -> Any:
-        faces = RetinaFace.detect_faces(np.array(image_data.image), threshold=0.999)
+        faces = RetinaFace.detect_faces(
+            image_data.to_numpy(), threshold=0.999, model=registry.get(MODEL_NAME)
+        )
+        if isinstance(faces, dict) and image_data.scale != 1:
+            faces = {key: self.to_original(face, image_data.scale) for key, face in faces.items()}
         image_data.set_faces(faces)
 
         if with_return:
             return faces
+
+    @staticmethod
+    def to_original(face: dict, scale: float) -> dict:
+        face = dict(face)
+        face["facial_area"] = [int(round(coord / scale)) for coord in face["facial_area"]]
+        if "landmarks" in face:
+            face["landmarks"] = {
+                name: [float(coord) / scale for coord in point]
+                for name, point in face["landmarks"].items()
+            }
+        return face
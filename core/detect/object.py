@@ -1,6 +1,6 @@
 from typing import Optional
-import cv2
 import numpy as np
+import torch
 
 from detectron2 import model_zoo
 from detectron2.engine import DefaultPredictor
@@ -9,6 +9,7 @@ from detectron2.data import MetadataCatalog
 
 from core.types import ImageData
 from core.detect.base import BaseDetector
+from core.registry import registry
 
 
 def _get_cfg() -> CfgNode:
@@ -22,46 +23,78 @@ def _get_cfg() -> CfgNode:
 
 
 IGNORE_CLASSES = [0]  # 0 - person
+MODEL_NAME = "faster_rcnn_R_101_FPN"
+
+registry.register(MODEL_NAME, lambda: DefaultPredictor(_get_cfg()))
 
 
 class ObjectDetector(BaseDetector):
-    cfg = _get_cfg()
-    metadata_catalog = MetadataCatalog.get(cfg.DATASETS.TRAIN[0])
-    predictor = DefaultPredictor(cfg)
+    @property
+    def predictor(self) -> DefaultPredictor:
+        return registry.get(MODEL_NAME)
+
+    @property
+    def metadata_catalog(self):
+        return MetadataCatalog.get(self.predictor.cfg.DATASETS.TRAIN[0])
 
     def detect(
         self, image: ImageData, with_return: bool = False
     ) -> Optional[list[tuple[str, float]]]:
-        cv2_im = cv2.cvtColor(np.array(image.image), cv2.COLOR_RGB2BGR)
-        outputs = self.predictor(cv2_im)
+        classes = self.detect_batch([image], batch_size=1, with_return=True)[0]  # type: ignore
+
+        if with_return:
+            return classes
 
-        ids = outputs["instances"].to("cpu").pred_classes.numpy()
-        probs = outputs["instances"].to("cpu").scores.numpy()
+    def detect_batch(
+        self, images: list[ImageData], batch_size: int = 4, with_return: bool = False
+    ) -> Optional[list[list[tuple[str, float]]]]:
+        model = self.predictor.model
+        results = []
+        for start in range(0, len(images), batch_size):
+            batch = images[start : start + batch_size]
+            inputs = [self.preprocess(image) for image in batch]
+
+            with torch.no_grad():
+                outputs = model(inputs)
+
+            for image, output in zip(batch, outputs):
+                results.append(self.postprocess(image, output["instances"].to("cpu")))
+
+        if with_return:
+            return results
+
+    def preprocess(self, image: ImageData) -> dict:
+        original_image = image.to_numpy()
+        if self.predictor.input_format == "BGR":
+            original_image = original_image[:, :, ::-1]
+
+        # Detectron2 rescales boxes to height x width, report them in original coordinates
+        height, width = original_image.shape[:2]
+        if image.scale != 1:
+            width, height = image.meta["size"]
+        resized = self.predictor.aug.get_transform(original_image).apply_image(original_image)
+        tensor = torch.as_tensor(resized.astype("float32").transpose(2, 0, 1))
+
+        return {"image": tensor, "height": height, "width": width}
+
+    def postprocess(self, image: ImageData, instances) -> list[tuple[str, float]]:
+        ids = instances.pred_classes.numpy()
+        probs = instances.scores.numpy()
+        boxes = instances.pred_boxes.tensor.numpy()
 
         ids, probs = self.filter_classes(ids, probs)
         classes = self.map_classes(ids, probs)
 
         image.set_objects(classes)
+        image.update_meta({"objects_bbox": boxes.tolist()})
 
-        image.update_meta(
-            {
-                "objects_bbox": outputs.get("instances")
-                .to("cpu")
-                .pred_boxes.tensor.numpy()
-                .tolist(),
-            }
-        )
-
-        if with_return:
-            return classes
+        return classes
 
     @classmethod
     def filter_classes(cls, ids: np.ndarray, scores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         mask = np.isin(ids, IGNORE_CLASSES, invert=True)
         return ids[mask], scores[mask]
 
-    @classmethod
-    def map_classes(cls, ids: np.ndarray, scores: np.ndarray) -> list[tuple[str, float]]:
-        return [
-            (cls.metadata_catalog.thing_classes[id], float(score)) for id, score in zip(ids, scores)
-        ]
+    def map_classes(self, ids: np.ndarray, scores: np.ndarray) -> list[tuple[str, float]]:
+        thing_classes = self.metadata_catalog.thing_classes
+        return [(thing_classes[id], float(score)) for id, score in zip(ids, scores)]
@@ -1,13 +1,26 @@
+import logging
 import torch
 import numpy as np
+from functools import partial
 from torchvision import transforms
 from torch.nn import functional as F
 from typing import Optional
 from core.detect.base import BaseDetector
 from wavemix.classification import WaveMix
 from core.detect.modules import labels
+from core.export import (
+    cached_export,
+    export_torch,
+    exported_name,
+    exported_path,
+    load_exported,
+    quantize_onnx,
+)
+from core.registry import registry
 from core.types import ImageData
+from types_ import InferenceBackend, InferencePrecision
 
+logger = logging.getLogger(__name__)
 
 tf = transforms.Compose(
     [
@@ -18,8 +31,13 @@ tf = transforms.Compose(
 )
 
 
-class SceneDetector(BaseDetector):
-    model = WaveMix(
+MODEL_NAME = "wavemix_places365"
+LABELS_NAME = "places365_labels"
+WEIGHTS_URL = "https://huggingface.co/cloudwalker/wavemix/resolve/main/Saved_Models_Weights/Places365/places365_54.94.pth"
+
+
+def _build_model() -> WaveMix:
+    return WaveMix(
         num_classes=365,
         depth=12,
         mult=2,
@@ -30,51 +48,151 @@ class SceneDetector(BaseDetector):
         initial_conv="pachify",
         patch_size=8,
     )
+
+
+def _load_model() -> WaveMix:
+    model = _build_model()
+    model.load_state_dict(torch.hub.load_state_dict_from_url(WEIGHTS_URL, map_location="cpu"))
+    model.eval()
+    return model
+
+
+def _load_labels() -> dict:
     classes, labels_IO, labels_attribute, W_attribute = labels.load_place_labels()
+    return {
+        "classes": classes,
+        "class_names": [c.split(" ")[0].split("/")[-1] for c in classes],
+        "labels_IO": labels_IO,
+        "labels_attribute": labels_attribute,
+        "W_attribute": W_attribute,
+    }
+
+
+def _export(path: str, backend: InferenceBackend):
+    model = registry.get(MODEL_NAME)
+    example = np.zeros((1, 3, 512, 512), dtype=np.float32)
+    export_torch(model, example=[example], path=path, backend=backend, input_names=["input"])
+    # The eager weights are only needed to trace the graph
+    registry.unload(MODEL_NAME)
+
+
+def _load_exported(backend: InferenceBackend, precision: InferencePrecision):
+    path = cached_export(exported_path(MODEL_NAME, backend), partial(_export, backend=backend))
+    if precision == InferencePrecision.INT8:
+        path = cached_export(
+            exported_path(MODEL_NAME, backend, precision), partial(quantize_onnx, path)
+        )
+    return load_exported(path, backend)
+
+
+registry.register(MODEL_NAME, _load_model)
+registry.register(LABELS_NAME, _load_labels)
+for _backend in (InferenceBackend.ONNX, InferenceBackend.TORCHSCRIPT):
+    registry.register(
+        exported_name(MODEL_NAME, _backend),
+        partial(_load_exported, _backend, InferencePrecision.FP32),
+    )
+registry.register(
+    exported_name(MODEL_NAME, InferenceBackend.ONNX, InferencePrecision.INT8),
+    partial(_load_exported, InferenceBackend.ONNX, InferencePrecision.INT8),
+)
+
 
-    def __init__(self) -> None:
-        super().__init__()
-        url = "https://huggingface.co/cloudwalker/wavemix/resolve/main/Saved_Models_Weights/Places365/places365_54.94.pth"
-        self.model.eval()
-        self.model.load_state_dict(torch.hub.load_state_dict_from_url(url, map_location="cpu"))
+class SceneDetector(BaseDetector):
+    def __init__(
+        self,
+        backend: InferenceBackend = InferenceBackend.EAGER,
+        precision: InferencePrecision = InferencePrecision.FP32,
+    ):
+        self.backend = InferenceBackend(backend)
+        self.precision = InferencePrecision(precision)
+        if self.precision == InferencePrecision.INT8 and self.backend != InferenceBackend.ONNX:
+            # WaveMix is mostly convolutions, torch dynamic quantisation only covers Linear layers
+            # while ONNX Runtime also quantises Conv
+            logger.info("INT8 scene detection runs on the onnx backend")
+            self.backend = InferenceBackend.ONNX
+
+    @property
+    def model(self):
+        if self.backend == InferenceBackend.EAGER and self.precision == InferencePrecision.FP32:
+            return registry.get(MODEL_NAME)
+        return registry.get(exported_name(MODEL_NAME, self.backend, self.precision))
+
+    def forward(self, input_imgs: torch.Tensor) -> torch.Tensor:
+        if self.backend == InferenceBackend.EAGER:
+            return self.model(input_imgs)
+        return torch.from_numpy(self.model(input_imgs.numpy()))
+
+    @property
+    def class_names(self) -> list[str]:
+        return registry.get(LABELS_NAME)["class_names"]
+
+    @property
+    def labels_IO(self) -> np.ndarray:
+        return registry.get(LABELS_NAME)["labels_IO"]
 
     def detect(
         self, image: ImageData, with_return: bool = False
     ) -> Optional[list[tuple[str, float]]]:
-        image.image.seek(0)
-        input_img = tf(image.image).unsqueeze(0).to("cpu")
+        classes = self.detect_batch([image], batch_size=1, with_return=True)[0]  # type: ignore
+
+        if with_return:
+            return classes
 
-        with torch.no_grad():
-            logits = self.model(input_img)
-            h_x = F.softmax(logits, 1).data.squeeze()
-            scores, idx = h_x.sort(0, True)
-            scores = scores.numpy()
-            idx = idx.numpy()
+    def detect_batch(
+        self, images: list[ImageData], batch_size: int = 16, with_return: bool = False
+    ) -> Optional[list[list[tuple[str, float]]]]:
+        results = []
+        for start in range(0, len(images), batch_size):
+            batch = images[start : start + batch_size]
+            input_imgs = torch.stack([self.preprocess(image) for image in batch]).to("cpu")
 
-        classes = self.get_top_classes(idx, scores)
+            with torch.no_grad():
+                logits = self.forward(input_imgs)
+                h_x = F.softmax(logits, 1)
+                scores, idx = h_x.topk(10, dim=1)
+                scores = scores.numpy()
+                idx = idx.numpy()
 
-        image.set_scenes(classes)
+            classes = self.get_top_classes_batch(idx, scores)
+            for image, image_classes in zip(batch, classes):
+                image.set_scenes(image_classes)
+            results.extend(classes)
 
         if with_return:
-            return classes
+            return results
+
+    @staticmethod
+    def preprocess(image: ImageData) -> torch.Tensor:
+        image.image.seek(0)
+        img = image.image
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        return tf(img)
 
     def get_top_classes(
         self, idx: np.ndarray, scores: np.ndarray, top_n: int = 5, threshold: float = 0.075
     ) -> list[tuple[str, float]]:
-        io_image = np.mean(self.labels_IO[idx[:10]])
-        if io_image < 0.5:
-            io = ("indoor", io_image)
-        else:
-            io = ("outdoor", io_image)
-
-        out = []
-        for i in range(0, 10):
-            if scores[i] > threshold:
-                class_name = self.classes[idx[i]].split(" ")[0].split("/")[-1]
-                out.append((class_name, scores[i].item()))
-        out.append(io)
-
-        n = min(top_n, len(out))
-        out.sort(key=lambda x: x[1], reverse=True)
-
-        return out[:n]
+        return self.get_top_classes_batch(idx[None], scores[None], top_n, threshold)[0]
+
+    def get_top_classes_batch(
+        self, idx: np.ndarray, scores: np.ndarray, top_n: int = 5, threshold: float = 0.075
+    ) -> list[list[tuple[str, float]]]:
+        idx = idx[:, :10]
+        scores = scores[:, :10]
+        io_images = self.labels_IO[idx].mean(axis=1)
+        keep = scores > threshold
+
+        results = []
+        for row_idx, row_scores, row_keep, io_image in zip(idx, scores, keep, io_images):
+            out = [
+                (self.class_names[i], float(score))
+                for i, score in zip(row_idx[row_keep], row_scores[row_keep])
+            ]
+            out.append(("indoor" if io_image < 0.5 else "outdoor", float(io_image)))
+
+            n = min(top_n, len(out))
+            out.sort(key=lambda x: x[1], reverse=True)
+            results.append(out[:n])
+
+        return results
@@ -1,15 +1,154 @@
 from __future__ import annotations
 
 import os
+from functools import partial
+
 import joblib
+import numpy as np
+import torch
 from PIL import Image
 
+from core.cache import LRUCache
+from core.export import cached_export, export_torch, exported_name, exported_path, load_exported
+from core.registry import registry
+from settings import Settings
+from types_ import InferenceBackend
+
 pickle_path = os.path.join(os.path.dirname(__file__), "clip.pkl")
-model = None
+MODEL_NAME = "clip"
+IMAGE_ENCODER = "clip_image"
+TEXT_ENCODER = "clip_text"
+# Search queries repeat a lot across users, their text embeddings are kept per model
+CLIP_TEXT_CACHE_SIZE = int(os.environ.get("CLIP_TEXT_CACHE_SIZE", 4096))
+# Text is always padded to the full context so traced graphs see a fixed sequence length
+CONTEXT_LENGTH = 77
+
+
+class _ImageEncoder(torch.nn.Module):
+    def __init__(self, clip):
+        super().__init__()
+        self.clip = clip
+
+    def forward(self, pixel_values):
+        pooled = self.clip.vision_model(pixel_values=pixel_values)[1]
+        return self.clip.visual_projection(pooled)
+
+
+class _TextEncoder(torch.nn.Module):
+    def __init__(self, clip):
+        super().__init__()
+        self.clip = clip
+
+    def forward(self, input_ids, attention_mask):
+        pooled = self.clip.text_model(input_ids=input_ids, attention_mask=attention_mask)[1]
+        return self.clip.text_projection(pooled)
+
+
+class ExportedClip:
+    def __init__(self, processor, image_encoder, text_encoder):
+        self.processor = processor
+        self.image_encoder = image_encoder
+        self.text_encoder = text_encoder
+
+    def encode(self, item: str | list[str] | Image.Image) -> np.ndarray:
+        # Mirrors SentenceTransformer.encode, a list of texts is encoded as one batch
+        if isinstance(item, str):
+            return self.encode([item])[0]
+
+        if isinstance(item, list):
+            inputs = self.processor(
+                text=item,
+                return_tensors="np",
+                padding="max_length",
+                max_length=CONTEXT_LENGTH,
+                truncation=True,
+            )
+            return self.text_encoder(
+                inputs["input_ids"].astype(np.int64), inputs["attention_mask"].astype(np.int64)
+            )
+
+        if item.mode != "RGB":
+            item = item.convert("RGB")
+        inputs = self.processor(images=[item], return_tensors="np")
+        return self.image_encoder(inputs["pixel_values"].astype(np.float32))[0]
+
 
+def _export(path: str, name: str, backend: InferenceBackend):
+    clip = registry.get(MODEL_NAME)[0].model
+    if name == IMAGE_ENCODER:
+        size = clip.config.vision_config.image_size
+        example = [np.zeros((1, 3, size, size), dtype=np.float32)]
+        export_torch(_ImageEncoder(clip), example, path, backend, input_names=["pixel_values"])
+    else:
+        tokens = np.zeros((1, CONTEXT_LENGTH), dtype=np.int64)
+        export_torch(
+            _TextEncoder(clip),
+            [tokens, np.ones_like(tokens)],
+            path,
+            backend,
+            input_names=["input_ids", "attention_mask"],
+            dynamic_axes={
+                "input_ids": {0: "batch"},
+                "attention_mask": {0: "batch"},
+                "output": {0: "batch"},
+            },
+        )
 
-def get_clip_embedding(image: str | Image.Image) -> list[float]:
-    global model
-    if model is None:
-        model = joblib.load(pickle_path)
+
+def _load_exported(backend: InferenceBackend) -> ExportedClip:
+    encoders = {}
+    for name in (IMAGE_ENCODER, TEXT_ENCODER):
+        path = cached_export(
+            exported_path(name, backend), partial(_export, name=name, backend=backend)
+        )
+        encoders[name] = load_exported(path, backend)
+
+    processor = registry.get(MODEL_NAME)[0].processor
+    # Only the tokenizer and image processor of the eager model are still needed
+    registry.unload(MODEL_NAME)
+    return ExportedClip(processor, encoders[IMAGE_ENCODER], encoders[TEXT_ENCODER])
+
+
+text_embedding_cache: LRUCache[list[float]] = LRUCache(CLIP_TEXT_CACHE_SIZE)
+
+registry.register(MODEL_NAME, lambda: joblib.load(pickle_path))
+for _backend in (InferenceBackend.ONNX, InferenceBackend.TORCHSCRIPT):
+    registry.register(exported_name(MODEL_NAME, _backend), partial(_load_exported, _backend))
+
+
+def get_clip_model(backend: InferenceBackend | None = None):
+    backend = InferenceBackend(backend or Settings().inference.clip)
+    if backend == InferenceBackend.EAGER:
+        return registry.get(MODEL_NAME)
+    return registry.get(exported_name(MODEL_NAME, backend))
+
+
+def get_clip_embedding(
+    image: str | Image.Image, backend: InferenceBackend | None = None
+) -> list[float]:
+    if isinstance(image, str):
+        return get_clip_embeddings([image], backend)[0]
+    model = get_clip_model(backend)
     return model.encode(image).tolist()  # type: ignore
+
+
+def normalize_text(text: str) -> str:
+    # The CLIP tokenizer lowercases and collapses whitespace, so this does not change the embedding
+    return " ".join(text.split()).lower()
+
+
+def get_clip_embeddings(
+    texts: list[str], backend: InferenceBackend | None = None
+) -> list[list[float]]:
+    backend = InferenceBackend(backend or Settings().inference.clip)
+    keys = [(exported_name(MODEL_NAME, backend), normalize_text(text)) for text in texts]
+    embeddings = {key: text_embedding_cache.get(key) for key in dict.fromkeys(keys)}
+
+    missing = [key for key, embedding in embeddings.items() if embedding is None]
+    if missing:
+        model = get_clip_model(backend)
+        encoded = model.encode([text for _, text in missing]).tolist()  # type: ignore
+        for key, embedding in zip(missing, encoded):
+            text_embedding_cache.set(key, embedding)
+            embeddings[key] = embedding
+    return [embeddings[key] for key in keys]  # type: ignore
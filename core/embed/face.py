@@ -1,4 +1,6 @@
+import logging
 from abc import ABC, abstractmethod
+from functools import partial
 
 import torch
 import numpy as np
@@ -6,7 +8,44 @@ from deepface.modules.modeling import build_model
 from deepface.modules.preprocessing import resize_image, normalize_input
 
 from core.types import ImageData
+from core.export import cached_export, exported_name, exported_path, load_exported, quantize_onnx
 from core.extract.face import FaceExtractor
+from core.registry import registry
+from types_ import InferenceBackend, InferencePrecision
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "facenet512"
+
+
+def _export_onnx(path: str):
+    import tensorflow as tf
+    import tf2onnx
+
+    model = registry.get(MODEL_NAME).model
+    spec = (tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=17, output_path=path)
+    registry.unload(MODEL_NAME)
+
+
+def _load_onnx(precision: InferencePrecision = InferencePrecision.FP32):
+    path = cached_export(exported_path(MODEL_NAME, InferenceBackend.ONNX), _export_onnx)
+    if precision == InferencePrecision.INT8:
+        path = cached_export(
+            exported_path(MODEL_NAME, InferenceBackend.ONNX, precision),
+            partial(quantize_onnx, path),
+        )
+    return load_exported(path, InferenceBackend.ONNX)
+
+
+registry.register(
+    MODEL_NAME, lambda: build_model(task="facial_recognition", model_name="Facenet512")
+)
+for _precision in InferencePrecision:
+    registry.register(
+        exported_name(MODEL_NAME, InferenceBackend.ONNX, _precision),
+        partial(_load_onnx, _precision),
+    )
 
 
 class BaseEmbedder(ABC):
@@ -20,18 +59,57 @@ class BaseEmbedder(ABC):
 
 
 class FaceEmbedder(BaseEmbedder):
-    FaceNet = build_model(task="facial_recognition", model_name="Facenet512")
-    target_size = FaceNet.input_shape
     extractor = FaceExtractor()
 
-    def get_embedding(self, img):
+    def __init__(
+        self,
+        backend: InferenceBackend = InferenceBackend.EAGER,
+        precision: InferencePrecision = InferencePrecision.FP32,
+    ):
+        # FaceNet is a Keras model, it can only be exported through tf2onnx
+        if InferenceBackend(backend) == InferenceBackend.TORCHSCRIPT:
+            raise ValueError("FaceEmbedder supports the eager and onnx backends only")
+        self.backend = InferenceBackend(backend)
+        self.precision = InferencePrecision(precision)
+        if self.precision == InferencePrecision.INT8 and self.backend == InferenceBackend.EAGER:
+            # Keras has no in-process dynamic quantisation, INT8 always runs the quantised graph
+            logger.info("INT8 face embeddings run on the onnx backend")
+            self.backend = InferenceBackend.ONNX
+
+    @property
+    def FaceNet(self):
+        if self.backend == InferenceBackend.ONNX:
+            return registry.get(exported_name(MODEL_NAME, self.backend, self.precision))
+        return registry.get(MODEL_NAME)
+
+    @property
+    def target_size(self) -> tuple[int, int]:
+        if self.backend == InferenceBackend.ONNX:
+            _, height, width, _ = self.FaceNet.input_shape
+            return width, height
+        return self.FaceNet.input_shape
+
+    def forward(self, batch: np.ndarray) -> np.ndarray:
+        if self.backend == InferenceBackend.ONNX:
+            return self.FaceNet(batch.astype(np.float32))
+        return np.asarray(self.FaceNet.model(batch, training=False), dtype=np.float32)
+
+    def preprocess(self, img) -> np.ndarray:
         img = np.array(img)
         img = img[:, :, ::-1]
         img = resize_image(img, target_size=(self.target_size[1], self.target_size[0]))
-        img = normalize_input(img=img, normalization="Facenet2018")
-        embedding = self.FaceNet.forward(img)
+        return normalize_input(img=img, normalization="Facenet2018")
+
+    def get_embedding(self, img):
+        if self.backend == InferenceBackend.ONNX:
+            return self.forward(self.preprocess(img))
+        embedding = self.FaceNet.forward(self.preprocess(img))
+
+        return np.asarray(embedding, dtype=np.float32)[None, :]
 
-        return torch.tensor(embedding).unsqueeze(0).numpy()
+    def get_embeddings(self, imgs: list) -> np.ndarray:
+        batch = np.concatenate([self.preprocess(img) for img in imgs])
+        return self.forward(batch)
 
     def extract_and_embed(self, image_data: ImageData, with_return: bool = False):
         for face, key in self.extractor.extract(image_data, with_key=True):
@@ -41,6 +119,32 @@ class FaceEmbedder(BaseEmbedder):
         if with_return:
             return image_data.faces
 
+    def extract_and_embed_batch(
+        self, image_data: list[ImageData], batch_size: int = 64, with_return: bool = False
+    ):
+        embedded = {}
+        keys: list[tuple[ImageData, str]] = []
+        crops = []
+
+        def flush():
+            for (data, key), embedding in zip(keys, self.get_embeddings(crops)):
+                data.set_face_embedding(key, embedding[None, :])
+                embedded[(data.id, key)] = data.faces[key]["embedding"]
+            keys.clear()
+            crops.clear()
+
+        for data in image_data:
+            for face, key in self.extractor.extract(data, with_key=True):
+                keys.append((data, key))
+                crops.append(face)
+                if len(crops) == batch_size:
+                    flush()
+        if crops:
+            flush()
+
+        if with_return:
+            return embedded
+
     @staticmethod
     def cosine_similarity(a: torch.Tensor, b: torch.Tensor) -> float:
         return torch.nn.functional.cosine_similarity(a, b).item()
@@ -0,0 +1,117 @@
+import logging
+import os
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+import torch
+
+from settings import Settings
+from types_ import InferenceBackend, InferencePrecision
+
+logger = logging.getLogger(__name__)
+
+SUFFIXES = {
+    InferenceBackend.EAGER: ".pt",
+    InferenceBackend.ONNX: ".onnx",
+    InferenceBackend.TORCHSCRIPT: ".pt",
+}
+
+
+def exported_name(
+    name: str, backend: InferenceBackend, precision: InferencePrecision = InferencePrecision.FP32
+) -> str:
+    if precision == InferencePrecision.FP32:
+        return f"{name}_{backend.value}"
+    return f"{name}_{backend.value}_{precision.value}"
+
+
+def exported_path(
+    name: str, backend: InferenceBackend, precision: InferencePrecision = InferencePrecision.FP32
+) -> str:
+    cache_dir = Settings().inference.cache_dir
+    return os.path.join(cache_dir, exported_name(name, backend, precision) + SUFFIXES[backend])
+
+
+def cached_export(path: str, export: Callable[[str], None]) -> str:
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        logger.info(f"Exporting {os.path.basename(path)}, this only happens once")
+        # Workers may export the same model at the same time, only a complete file is renamed
+        tmp = f"{path}.{os.getpid()}.part"
+        export(tmp)
+        os.replace(tmp, path)
+    return path
+
+
+def export_torch(
+    module: torch.nn.Module,
+    example: Sequence[np.ndarray],
+    path: str,
+    backend: InferenceBackend,
+    input_names: Sequence[str],
+    dynamic_axes: Optional[dict[str, dict[int, str]]] = None,
+):
+    inputs = tuple(torch.from_numpy(x) for x in example)
+    module.eval()
+    with torch.no_grad():
+        if backend == InferenceBackend.ONNX:
+            torch.onnx.export(
+                module,
+                inputs,
+                path,
+                input_names=list(input_names),
+                output_names=["output"],
+                dynamic_axes=dynamic_axes
+                or {name: {0: "batch"} for name in [*input_names, "output"]},
+                opset_version=17,
+                # The TorchScript-based exporter handles the wavelet and CLIP graphs as traced
+                dynamo=False,
+            )
+        elif backend == InferenceBackend.TORCHSCRIPT:
+            traced = torch.jit.freeze(torch.jit.trace(module, inputs))
+            torch.jit.save(traced, path)
+        else:
+            raise ValueError(f"Cannot export to {backend.value}")
+
+
+def quantize_onnx(source: str, path: str):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # Weights are stored as INT8 and activations are quantised on the fly, no calibration needed.
+    # Conv, MatMul and Gemm nodes are all quantised
+    quantize_dynamic(source, path, weight_type=QuantType.QInt8)
+
+
+class OnnxModel:
+    def __init__(self, path: str, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    @property
+    def input_shape(self) -> list:
+        return self.session.get_inputs()[0].shape
+
+    def __call__(self, *inputs: np.ndarray) -> np.ndarray:
+        return self.session.run(None, dict(zip(self.input_names, inputs)))[0]
+
+
+class TorchScriptModel:
+    def __init__(self, path: str):
+        self.module = torch.jit.optimize_for_inference(torch.jit.load(path, map_location="cpu"))
+
+    def __call__(self, *inputs: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return self.module(*(torch.from_numpy(x) for x in inputs)).numpy()
+
+
+def load_exported(path: str, backend: InferenceBackend) -> OnnxModel | TorchScriptModel:
+    if backend == InferenceBackend.ONNX:
+        return OnnxModel(path, Settings().inference.num_threads)
+    if backend == InferenceBackend.TORCHSCRIPT:
+        return TorchScriptModel(path)
+    raise ValueError(f"{backend.value} is not an exported backend")
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from typing import Generator
 import numpy as np
 from core.extract.utils import extract_face
+from core.loader.decode import face_source, scale_box
 from core import types
 from core.detect.face import FaceDetector
 
@@ -20,8 +21,11 @@ class FaceExtractor(BaseExtractor):
     ) -> Generator[np.ndarray | tuple[np.ndarray, str], None, None]:
         if not image_data.faces:
             self.detector.detect(image_data)
-        for face_key, face in image_data.faces.items():
-            if with_key:
-                yield extract_face(image_data.image, face["facial_area"]), face_key
-            else:
-                yield extract_face(image_data.image, face["facial_area"])
+        boxes = [face["facial_area"] for face in image_data.faces.values()]
+        with face_source(image_data, boxes) as (image, scale):
+            for face_key, face in image_data.faces.items():
+                crop = extract_face(image, scale_box(face["facial_area"], scale))
+                if with_key:
+                    yield crop, face_key
+                else:
+                    yield crop
@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+from math import ceil
+from typing import Generator, Optional, Sequence
+
+from PIL import Image
+
+from core.types import BoxType, ImageData
+
+
+def open_scaled(path: str, scale: float = 1.0) -> tuple[Image.Image, float]:
+    image = Image.open(path)
+    width, height = image.size
+    if scale >= 1:
+        return image, 1.0
+
+    size = (max(ceil(width * scale), 1), max(ceil(height * scale), 1))
+    if image.format == "JPEG":
+        # The JPEG decoder skips DCT coefficients and decodes at 1/2, 1/4 or 1/8 directly,
+        # picking the smallest factor that still covers the requested size
+        image.draft(None, size)
+    else:
+        factor = min(width // size[0], height // size[1])
+        if factor > 1:
+            try:
+                reduced = image.reduce(factor)
+            except ValueError:
+                # reduce() does not support palette and a few other modes
+                return image, 1.0
+            image.close()
+            image = reduced
+
+    return image, image.size[0] / width
+
+
+def open_reduced(path: str, max_side: Optional[int] = None) -> tuple[Image.Image, float]:
+    if not max_side:
+        return Image.open(path), 1.0
+
+    with Image.open(path) as image:
+        longest = max(image.size)
+    return open_scaled(path, max_side / longest)
+
+
+def scale_box(box: BoxType, scale: float) -> list[float]:
+    return [float(coord) * scale for coord in box]
+
+
+@contextmanager
+def face_source(
+    image_data: ImageData, boxes: Sequence[BoxType], min_side: int = 160
+) -> Generator[tuple[Image.Image, float], None, None]:
+    # Boxes are in original coordinates, crop from a buffer where the smallest face
+    # is at least min_side pixels, re-decoding the photo at a higher scale if needed
+    scale = image_data.scale
+    if scale >= 1 or not image_data.path or not boxes:
+        yield image_data.image, scale
+        return
+
+    smallest = min(min(box[2] - box[0], box[3] - box[1]) for box in boxes)
+    if smallest * scale >= min_side:
+        yield image_data.image, scale
+        return
+
+    image, source_scale = open_scaled(image_data.path, min(min_side / max(smallest, 1), 1.0))
+    try:
+        yield image, source_scale
+    finally:
+        image.close()
@@ -1,21 +1,30 @@
 from uuid import uuid4
 
 import os
+import queue
+import threading
 import uuid
 from PIL import Image, ExifTags
-from typing import Generator
+from typing import Generator, Iterable, Optional
+from core.loader.decode import open_reduced
 from core.types import EmbeddingData, ImageData
 
 
 class ImageLoader:
 
-    def __init__(self, images: str | list[str], auto_load: bool = False):
+    def __init__(
+        self,
+        images: str | Iterable[str],
+        auto_load: bool = False,
+        max_side: Optional[int] = None,
+    ):
         if isinstance(images, str):
             if os.path.isdir(images):
                 for root, _, files in os.walk(images):
                     self.images = [os.path.join(root, file) for file in files]
         else:
             self.images = images
+        self.max_side = max_side
         self.image_data: dict[uuid.UUID, ImageData] = {}
         self.faces: dict[tuple[uuid.UUID, str], EmbeddingData] = {}
         self._is_faces_detected = False
@@ -24,16 +33,19 @@ class ImageLoader:
             self.load()
 
     def __del__(self):
-        for _, img in self.image_data.items():
-            img.image.close()
+        self.close()
 
     def __enter__(self):
         self.load()
         return self.image_data
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
         for _, img in self.image_data.items():
-            img.image.close()
+            if img.image is not None:
+                img.image.close()
 
     def update_face_index(self):
         for _, img in self.image_data.items():
@@ -50,6 +62,57 @@ class ImageLoader:
         for key, img in self.image_data.items():
             yield key, img
 
+    def stream(self, prefetch: int = 8) -> Generator[tuple[uuid.UUID, ImageData], None, None]:
+        # Callers must release() each yielded image once every stage is done with it
+        buffer: queue.Queue = queue.Queue(maxsize=max(prefetch, 1))
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for img in self.images:
+                    if stop.is_set():
+                        return
+                    image_data = self._load_image(img)
+                    image_data.image.load()
+                    if not put(image_data):
+                        image_data.release()
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        producer = threading.Thread(target=produce, name="image-loader-prefetch", daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = buffer.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                self.image_data[item.id] = item
+                yield item.id, item
+        finally:
+            stop.set()
+            # A put in flight can still land after stop is set, drain only once the producer exits
+            producer.join()
+            while not buffer.empty():
+                item = buffer.get_nowait()
+                if isinstance(item, ImageData):
+                    item.release()
+
     def _open_image(self, image: str | Image.Image | bytes) -> Image.Image:
         if isinstance(image, str):
             return Image.open(image)
@@ -60,6 +123,30 @@ class ImageLoader:
         else:
             raise ValueError("Image must be a path or PIL.Image.Image or bytes")
 
+    def _load_image(self, img: str) -> ImageData:
+        scale = 1.0
+        if isinstance(img, str):
+            _img, scale = open_reduced(img, self.max_side)
+        else:
+            _img = self._open_image(img)
+        exif = {ExifTags.TAGS[k]: v for k, v in _img.getexif().items() if k in ExifTags.TAGS}
+
+        metadata = {
+            "exif": exif,
+            "size": (round(_img.size[0] / scale), round(_img.size[1] / scale)),
+            "mode": _img.mode,
+        }
+
+        id = img.split("/")[-1].split(".")[0]
+
+        return ImageData(
+            id=uuid.UUID(id),
+            image=_img,
+            meta=metadata,
+            path=img if isinstance(img, str) else None,
+            scale=scale,
+        )
+
     def load(self):
         if self.image_data:
             for key, img in self.image_data.items():
@@ -67,22 +154,8 @@ class ImageLoader:
                 return
 
         for img in self.images:
-            _img = self._open_image(img)
-            exif = {ExifTags.TAGS[k]: v for k, v in _img.getexif().items() if k in ExifTags.TAGS}
-
-            metadata = {
-                "exif": exif,
-                "size": _img.size,
-                "mode": _img.mode,
-            }
-
-            id = img.split("/")[-1].split(".")[0]
-
-            self.image_data[uuid.UUID(id)] = ImageData(
-                id=uuid.UUID(id),
-                image=_img,
-                meta=metadata,
-            )
+            image_data = self._load_image(img)
+            self.image_data[image_data.id] = image_data
 
     def get_embeddings(self):
         embeddings = []
@@ -0,0 +1,78 @@
+import logging
+import os
+import resource
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelStats:
+    name: str
+    load_seconds: float
+    rss_mb: float
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Peak rather than current RSS, still good enough to compare models loaded in order
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders: dict[str, Callable[[], Any]] = {}
+        self._models: dict[str, Any] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats: dict[str, ModelStats] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"Model {name} is not registered")
+
+        # One lock per model so loading a slow model does not block the others
+        with self._locks[name]:
+            if name not in self._models:
+                rss = _rss_mb()
+                start = time.perf_counter()
+                self._models[name] = self._loaders[name]()
+                stats = ModelStats(
+                    name=name,
+                    load_seconds=time.perf_counter() - start,
+                    rss_mb=max(_rss_mb() - rss, 0.0),
+                )
+                self.stats[name] = stats
+                logger.info(
+                    f"Loaded {name} in {stats.load_seconds:.2f}s (+{stats.rss_mb:.0f} MB RSS)"
+                )
+            return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def unload(self, name: str):
+        with self._locks.get(name, self._lock):
+            self._models.pop(name, None)
+            self.stats.pop(name, None)
+
+    def report(self) -> list[dict[str, Any]]:
+        return [asdict(stats) for stats in self.stats.values()]
+
+
+registry = ModelRegistry()
@@ -18,7 +18,6 @@ class EntitySearcher(ABC):
 class PeopleSearcher(EntitySearcher):
     def __init__(self, person_handler):
         self.person_handler = person_handler
-        self.result_parser = PeopleResultParser()
 
     async def search(self, query: dict[str, Any], user: User) -> ResultParser:
         person_names = query.get("entities", [])
@@ -26,34 +25,36 @@ class PeopleSearcher(EntitySearcher):
             person_names.remove("<me>")
             person_names.append(user.name)
         results = await self.person_handler.search_by_name(person_names, user)
-        self.result_parser.parse(results, person_names)
-        return self.result_parser
+        # Searchers are shared across requests, each search gets its own parser
+        result_parser = PeopleResultParser()
+        result_parser.parse(results, person_names)
+        return result_parser
 
 
 class PhotoSearcher(EntitySearcher):
     def __init__(self, photo_handler):
         self.photo_handler = photo_handler
-        self.result_parser = PhotoResultParser()
 
     async def search(self, query: dict[str, Any], user: User) -> ResultParser:
         search_terms = query.get("entities", [])
         results = await self.photo_handler.search_by_terms(search_terms, user)
-        self.result_parser.parse(results, search_terms)
-        return self.result_parser
+        result_parser = PhotoResultParser()
+        result_parser.parse(results, search_terms)
+        return result_parser
 
 
 class AlbumSearcher(EntitySearcher):
     def __init__(self, album_handler):
         self.album_handler = album_handler
-        self.result_parser = AlbumResultParser()
 
     async def search(self, query: dict[str, Any], user: User) -> ResultParser:
         # TODO: Need to find a way to search albums effectively
         # For now, we can just map the photos to albums with minimum #photos threshold
         album_names = query.get("description", [])
         results = await self.album_handler.search_by_description(album_names, user)
-        self.result_parser.parse(results, album_names)
-        return self.result_parser
+        result_parser = AlbumResultParser()
+        result_parser.parse(results, album_names)
+        return result_parser
 
 
 class DatabaseOperations:
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Any
 
@@ -7,7 +8,8 @@ from models import User
 from handlers import PhotoHandler, PersonHandler
 from settings import Settings
 from core.search.db_ops import DatabaseOperations, PeopleSearcher, PhotoSearcher
-from core.search.search_plugin import search_plugin
+from core.embed.clip import get_clip_model
+from core.search.search_plugin import SearchPlugin
 from core.search.templates.semantic_parsing_template import SemanticParsingTemplate
 from core.search.prompt_library import PromptFactory, AdapterType
 from core.search.templates.clip_embedding_template import ClipEmbeddingTemplate
@@ -17,8 +19,8 @@ COHERE_API_KEY = os.environ.get("COHERE_API_KEY")
 
 class LLMSearch:
 
-    def __init__(self, user: User, settings: Settings, adapter_type: AdapterType, model: str):
-        self.user = user
+    def __init__(self, settings: Settings, adapter_type: AdapterType, model: str):
+        # Built once per process, only the user and query change between searches
         self.settings = settings
         self.cohere_client = cohere.Client(api_key=COHERE_API_KEY)
 
@@ -32,20 +34,17 @@ class LLMSearch:
         )
 
         adapter = PromptFactory.get_adapter(adapter_type, client=self.cohere_client, model=model)
-        semantic_template = SemanticParsingTemplate(adapter, db_ops)
-        clip_template = ClipEmbeddingTemplate(adapter, db_ops)
-        search_plugin.register_template(semantic_template)
-        search_plugin.register_template(clip_template)
+        self.search_plugin = SearchPlugin()
+        self.search_plugin.register_template(SemanticParsingTemplate(adapter, db_ops))
+        self.search_plugin.register_template(ClipEmbeddingTemplate(adapter, db_ops))
 
-    async def search(self, query: str, **kwargs) -> dict[str, Any]:
-        results = {}
-        for template in search_plugin.get_templates().values():
-            result = await template.search(query, self.user, **kwargs)
-            results[template.name] = result
-
-        return results
+    def warmup(self):
+        get_clip_model()
 
+    async def search(self, query: str, user: User, **kwargs) -> dict[str, Any]:
+        templates = list(self.search_plugin.get_templates().values())
+        results = await asyncio.gather(
+            *(template.search(query, user, **kwargs) for template in templates)
+        )
+        return {template.name: result for template, result in zip(templates, results)}
 
-async def llm_search(query: str, user: User, settings: Settings) -> dict[str, Any]:
-    search = LLMSearch(user, settings, AdapterType.COHERE, "command-r")
-    return await search.search(query)
@@ -1,5 +1,6 @@
 from .factory import PromptFactory
 from .base import BasePromptAdapter, BasePromptGenerator
 from .adapters import CohereAdapter
+from .cache import PromptCache, prompt_cache
 from .generators import SemanticParsingGenerator, SimilarQueryGenerator
 from .types import LLMType, PromptType, AdapterType, GeneratorType, PromptResult
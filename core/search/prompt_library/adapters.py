@@ -1,22 +1,24 @@
 import json
 import cohere
+from core.search.executor import run_blocking
 from core.search.prompt_library.base import BasePromptAdapter
 from core.search.prompt_library.types import PromptResult, LLMType, GeneratorType
 
 
 class CohereAdapter(BasePromptAdapter):
     def __init__(self, client: cohere.Client, model: str):
-        super().__init__(LLMType.COHERE)
+        super().__init__(LLMType.COHERE, model)
         if model not in LLMType.COHERE.available_models[GeneratorType.SEMANTIC_PARSING]:
             raise ValueError(f"Unsupported model: {model}")
         self.client = client
-        self.model = model
 
     def generate_prompt(self, query: str) -> str:
         return query
 
-    async def execute_prompt(self, prompt: str, **kwargs) -> str:
-        response = self.client.chat(
+    async def _execute_prompt(self, prompt: str, **kwargs) -> str:
+        # The sync client would block the event loop for the whole LLM call
+        response = await run_blocking(
+            self.client.chat,
             model=self.model,
             message=prompt,
             response_format={"type": "json_object"},  # type: ignore
@@ -1,17 +1,46 @@
 from abc import ABC, abstractmethod
+from typing import Optional
+
+from core.search.executor import run_blocking
+from core.search.prompt_library.cache import PromptCache, cache_key, prompt_cache
 from core.search.prompt_library.types import LLMType
 
 
 class BasePromptAdapter(ABC):
-    def __init__(self, llm_type: LLMType):
+    def __init__(self, llm_type: LLMType, model: str, cache: Optional[PromptCache] = prompt_cache):
         self.llm_type = llm_type
+        self.model = model
+        self.cache = cache
 
     @abstractmethod
     def generate_prompt(self, query: str) -> str:
         pass
 
-    @abstractmethod
     async def execute_prompt(self, prompt: str, **kwargs) -> str:
+        if self.cache is None:
+            return await self._execute_prompt(prompt, **kwargs)
+
+        key = cache_key(prompt, f"{self.llm_type.value}/{self.model}", **kwargs)
+        if self.cache.persistent:
+            # The sqlite tier blocks on disk, keep it off the event loop
+            response = await run_blocking(self.cache.get, key)
+        else:
+            response = self.cache.get(key)
+        if response is None:
+            response = await self._execute_prompt(prompt, **kwargs)
+            try:
+                self.parse_response(response)
+            except ValueError:
+                # Malformed responses are not cached so the next search asks again
+                return response
+            if self.cache.persistent:
+                await run_blocking(self.cache.set, key, response)
+            else:
+                self.cache.set(key, response)
+        return response
+
+    @abstractmethod
+    async def _execute_prompt(self, prompt: str, **kwargs) -> str:
         pass
 
     @abstractmethod
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from core.cache import LRUCache
+
+PROMPT_CACHE_SIZE = int(os.environ.get("PROMPT_CACHE_SIZE", 1024))
+PROMPT_CACHE_TTL = float(os.environ.get("PROMPT_CACHE_TTL", 24 * 60 * 60))
+# Optional sqlite file so cached responses survive restarts and are shared between workers
+PROMPT_CACHE_PATH = os.environ.get("PROMPT_CACHE_PATH")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+def cache_key(prompt: str, model: str, **params) -> str:
+    key = json.dumps(
+        {"prompt": normalize_prompt(prompt), "model": model, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class PromptCache:
+    def __init__(
+        self,
+        maxsize: int = PROMPT_CACHE_SIZE,
+        ttl: Optional[float] = PROMPT_CACHE_TTL,
+        path: Optional[str] = PROMPT_CACHE_PATH,
+    ):
+        self.ttl = ttl
+        self.memory: LRUCache[str] = LRUCache(maxsize, ttl)
+        self.disk_hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_cache "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def get(self, key: str) -> Optional[str]:
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+
+        row = None
+        if self._db is not None:
+            expired = time.time() - self.ttl if self.ttl is not None else 0.0
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT response, created FROM prompt_cache WHERE key = ? AND created >= ?",
+                    (key, expired),
+                ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self.memory.set(key, row[0], created=row[1])
+        return row[0]
+
+    def set(self, key: str, response: str):
+        created = time.time()
+        self.memory.set(key, response, created=created)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO prompt_cache (key, response, created) VALUES (?, ?, ?)",
+                    (key, response, created),
+                )
+                self._db.commit()
+
+    def clear(self):
+        self.memory.clear()
+        self.disk_hits = 0
+        self.misses = 0
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM prompt_cache")
+                self._db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.memory.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self.memory),
+            "memory_hits": self.memory.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+prompt_cache = PromptCache()
@@ -5,10 +5,12 @@ from core.search.prompt_library.types import GeneratorType
 from core.search.templates.base_template import BaseSearchTemplate
 from core.search.db_ops import DatabaseOperations
 from models import User
-from core.embed.clip import get_clip_embedding
+from core.embed.clip import get_clip_embeddings
+from core.search.executor import run_blocking
 from db import QdrantConnection
 from db.config import QdrantCollections
 from collections import defaultdict
+from threading import Lock
 
 
 class ClipEmbeddingTemplate(BaseSearchTemplate):
@@ -18,6 +20,8 @@ class ClipEmbeddingTemplate(BaseSearchTemplate):
         self.similar_query_generator: BasePromptGenerator = PromptFactory.get_generator(
             GeneratorType.SIMILAR_QUERY, self.adapter.llm_type
         )
+        self._qdrant: QdrantConnection | None = None
+        self._qdrant_lock = Lock()
 
     async def search(self, query: str, user: User, **kwargs) -> dict[str, Any]:
         similar_queries = await self.generate_similar_queries(query, **kwargs)
@@ -30,35 +34,30 @@ class ClipEmbeddingTemplate(BaseSearchTemplate):
         parsed_response = self.adapter.parse_response(response)
         return parsed_response["similar_queries"]
 
+    @property
+    def qdrant(self) -> QdrantConnection:
+        # One connection for the life of the template, opening one checks the collection exists
+        with self._qdrant_lock:
+            if self._qdrant is None:
+                self._qdrant = QdrantConnection(collection=QdrantCollections.CLIP_EMBEDDINGS)
+        return self._qdrant
+
     async def _search_clip_embeddings(
         self, queries: list[str], k: int, **kwargs
     ) -> list[dict[str, Any]]:
-        clip_results = []
+        clip_results = await run_blocking(self._search_queries, queries, k)
         rrf_scores = defaultdict(float)
+        payloads = {}
         _k = 60
 
-        for query in queries:
-            embedding = get_clip_embedding(query)
-
-            with QdrantConnection(collection=QdrantCollections.CLIP_EMBEDDINGS) as conn:
-                results = conn.search(embedding, top_k=k, threshold=0.21)
-                clip_results.append(results)
-
+        for results in clip_results:
             for rank, result in enumerate(results, start=1):
                 rrf_scores[result["id"]] += 1 / (_k + rank)
+                payloads.setdefault(result["id"], result)
 
-        sorted_results = sorted(rrf_scores.items(), key=lambda x: x[1], reverse=True)
-
-        final_results = []
-        for id, _ in sorted_results[:5]:
-            for query_results in clip_results:
-                for result in query_results:
-                    if result["id"] == id:
-                        final_results.append(result)
-                        break
-                if len(final_results) == 5:
-                    break
-            if len(final_results) == 5:
-                break
+        top_ids = sorted(rrf_scores, key=rrf_scores.__getitem__, reverse=True)[:5]
+        return [payloads[id] for id in top_ids]
 
-        return final_results
+    def _search_queries(self, queries: list[str], k: int) -> list[list[dict[str, Any]]]:
+        embeddings = get_clip_embeddings(queries)
+        return self.qdrant.search_batch(embeddings, top_k=k, threshold=0.21)
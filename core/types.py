@@ -9,7 +9,14 @@ from numpy.typing import ArrayLike
 from torch import Tensor, tensor
 from PIL.Image import Image
 
-from pydantic import BaseModel, field_validator, BeforeValidator, ConfigDict, PlainSerializer
+from pydantic import (
+    BaseModel,
+    field_validator,
+    BeforeValidator,
+    ConfigDict,
+    PlainSerializer,
+    PrivateAttr,
+)
 
 
 BoxType = tuple[float, float, float, float] | tuple[int, int, int, int] | Sequence[float | int]
@@ -19,11 +26,17 @@ class ImageData(BaseModel):
     id: uuid.UUID
     image: Any
     meta: dict = dict()
+    # Models see a buffer decoded at `scale` times the original resolution, boxes are stored
+    # in original coordinates
+    path: Optional[str] = None
+    scale: float = 1.0
 
     faces: dict = {}
     scenes: list[tuple[str, float]] = []
     objects: list[tuple[str, float]] = []
 
+    _array: Optional[np.ndarray] = PrivateAttr(default=None)
+
     def to_embedding_data(self, embeddings: Sequence[np.ndarray]) -> Sequence[EmbeddingData]:
         return [
             EmbeddingData(id=self.id, embedding=embedding, meta=self.meta)
@@ -31,7 +44,10 @@ class ImageData(BaseModel):
         ]
 
     def to_numpy(self) -> np.ndarray:
-        return np.array(self.image)
+        if self._array is None:
+            image = self.image if self.image.mode == "RGB" else self.image.convert("RGB")
+            self._array = np.asarray(image)
+        return self._array
 
     def to_tensor(self) -> Tensor:
         return tensor(np.array(self.image))
@@ -51,6 +67,38 @@ class ImageData(BaseModel):
     def update_meta(self, meta: dict):
         self.meta.update(meta)
 
+    def to_result(self) -> dict[str, Any]:
+        faces = {}
+        for face_key, face in self.faces.items():
+            faces[face_key] = dict(face)
+            faces[face_key]["facial_area"] = np.asarray(face["facial_area"], dtype=np.int32)
+            if "embedding" in face:
+                faces[face_key]["embedding"] = np.asarray(face["embedding"], dtype=np.float32)
+
+        meta = dict(self.meta)
+        if "objects_bbox" in meta:
+            meta["objects_bbox"] = np.asarray(meta["objects_bbox"], dtype=np.float32)
+
+        return {
+            "id": self.id,
+            "meta": meta,
+            "path": self.path,
+            "scale": self.scale,
+            "faces": faces,
+            "scenes": self.scenes,
+            "objects": self.objects,
+        }
+
+    @classmethod
+    def from_result(cls, result: dict[str, Any]) -> ImageData:
+        return cls.model_construct(image=None, **result)
+
+    def release(self):
+        if isinstance(self.image, Image):
+            self.image.close()
+        self.image = None
+        self._array = None
+
     @field_validator("image")
     def check_image(cls, value: Image) -> Image:
         if not isinstance(value, Image):
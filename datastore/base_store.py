@@ -20,6 +20,10 @@ class BaseDataStore(ABC):
     def download(self, file_id: str) -> tuple[Optional[bytes | str], Optional[str]]:
         pass
 
+    @abstractmethod
+    def download_to_file(self, file_id: str, dest_dir: str) -> Optional[str]:
+        pass
+
     @abstractmethod
     def get_file_path(self, file_id: str) -> str:
         pass
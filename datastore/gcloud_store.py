@@ -1,4 +1,5 @@
 import base64
+import os
 from google.cloud import storage
 from typing import Optional, BinaryIO
 from datastore import BaseDataStore
@@ -29,6 +30,18 @@ class GCloudStore(BaseDataStore):
         file_extension = blob.name.split(".")[-1]
         return content, f"image/{file_extension}"
 
+    def download_to_file(self, file_id: str, dest_dir: str) -> Optional[str]:
+        blob = self.get_blob(file_id)
+        if not blob:
+            return None
+        file_path = os.path.join(dest_dir, blob.name.split("/")[-1])
+        if os.path.exists(file_path):
+            return file_path
+        # Stream to a temporary name so an interrupted download is never read as a photo
+        blob.download_to_filename(f"{file_path}.part")
+        os.replace(f"{file_path}.part", file_path)
+        return file_path
+
     def get_file_path(self, file_id: str) -> str:
         blob = self.get_blob(file_id)
         if not blob:
@@ -30,6 +30,10 @@ class LocalStore(BaseDataStore):
         file_extension = os.path.splitext(file_path)[1][1:]
         return content, f"image/{file_extension}"
 
+    def download_to_file(self, file_id: str, dest_dir: str) -> Optional[str]:
+        # Files are already on local disk, read them in place
+        return self.get_file_path(file_id) or None
+
     def get_file_path(self, file_id: str) -> str:
         for file in os.listdir(self.user_path):
             if file.startswith(file_id):
@@ -24,7 +24,14 @@ class BaseConnection(ABC):
         pass
 
     @abstractmethod
-    def find(self, query: dict, fields: Optional[dict] = None, limit: int = 100, page: int = 0):
+    def find(
+        self,
+        query: dict,
+        fields: Optional[dict] = None,
+        limit: int = 100,
+        page: int = 0,
+        sort: Optional[str] = None,
+    ):
         pass
 
     @abstractmethod
@@ -82,7 +89,14 @@ class DBConnection(BaseConnection):
     def insert_many(self, data: list[dict]):
         raise NotImplementedError
 
-    def find(self, query: dict, fields: Optional[dict] = None, limit: int = 100, page: int = 0):
+    def find(
+        self,
+        query: dict,
+        fields: Optional[dict] = None,
+        limit: int = 100,
+        page: int = 0,
+        sort: Optional[str] = None,
+    ):
         raise NotImplementedError
 
     def find_by_id(self, id: uuid.UUID):
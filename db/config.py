@@ -1,7 +1,7 @@
 import os
 from enum import Enum
 from typing import Type
-from models import Album, Face, Person, Photo, User, PhotoAlbumLink
+from models import Album, Face, Person, Photo, PhotoJob, User, PhotoAlbumLink
 
 class Entity(Enum):
     USER = "users"
@@ -10,8 +10,11 @@ class Entity(Enum):
     PERSON = "person"
     FACE = "face"
     PHOTO_ALBUM_LINK = "photo_album_link"
+    PHOTO_JOB = "photo_job"
 
-    def get_class(self) -> Type[User | Photo | Album | Person | Face | PhotoAlbumLink]:
+    def get_class(
+        self,
+    ) -> Type[User | Photo | Album | Person | Face | PhotoAlbumLink | PhotoJob]:
         if self == Entity.USER:
             return User
         elif self == Entity.PHOTO:
@@ -24,6 +27,8 @@ class Entity(Enum):
             return Face
         elif self == Entity.PHOTO_ALBUM_LINK:
             return PhotoAlbumLink
+        elif self == Entity.PHOTO_JOB:
+            return PhotoJob
         else:
             raise ValueError("Invalid collection")
 
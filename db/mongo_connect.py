@@ -1,7 +1,7 @@
 import uuid
 from typing import Optional
 
-from pymongo import MongoClient
+from pymongo import ASCENDING, MongoClient
 from pymongo.database import Database
 from pymongo.errors import DuplicateKeyError
 from sqlmodel import SQLModel
@@ -55,10 +55,14 @@ class MongoConnection(DBConnection):
         fields: Optional[dict] = None,
         limit: int = 100,
         page: int = 0,
+        sort: Optional[str] = None,
     ) -> list[dict]:
         skip = page * limit
         converted_query = self._convert_uuid_in_query(query)
-        return list(self.collection.find(converted_query, fields).skip(skip).limit(limit))
+        cursor = self.collection.find(converted_query, fields)
+        if sort:
+            cursor = cursor.sort(sort, ASCENDING)
+        return list(cursor.skip(skip).limit(limit))
 
     def find_by_id(self, id: uuid.UUID) -> Optional[dict]:
         return self.collection.find_one({"id": str(id)})
@@ -1,4 +1,5 @@
 import uuid
+from typing import Optional
 
 from qdrant_client import models, QdrantClient
 
@@ -63,6 +64,36 @@ class QdrantConnection:
                 response.append(payload)
         return response
 
+    def search_batch(
+        self,
+        embeddings: list[list[float]],
+        top_k: int = 10,
+        threshold: Optional[float] = 0.21,
+        query_filter: Optional[models.Filter] = None,
+    ) -> list[list[dict]]:
+        results = self._client.search_batch(
+            collection_name=self.collection_name,
+            requests=[
+                models.SearchRequest(
+                    vector=embedding,
+                    filter=query_filter,
+                    limit=top_k,
+                    score_threshold=threshold,
+                    with_payload=True,
+                )
+                for embedding in embeddings
+            ],
+        )
+        response = []
+        for points in results:
+            payloads = []
+            for point in points:
+                if point.payload:
+                    point.payload["score"] = point.score
+                    payloads.append(point.payload)
+            response.append(payloads)
+        return response
+
     def upsert_many(
         self, ids: list[uuid.UUID], data: list[dict], embeddings: list[list[float]]
     ) -> None:
@@ -124,8 +124,11 @@ class SqlConnection(DBConnection):
         fields: dict = dict(),
         limit: int = 100,
         page: int = 0,
+        sort: Optional[str] = None,
     ):
         columns, statement = self.generate_statement_from_query(query, fields, "select")
+        if sort:
+            statement = statement.order_by(getattr(self.model, sort))  # type: ignore
         statement = statement.limit(limit).offset(page * limit)  # type: ignore
 
         with SqlDatabaseManager() as db:
@@ -1,3 +1,4 @@
+import threading
 from typing import Generator
 
 from sqlalchemy.engine import Engine
@@ -28,12 +29,11 @@ class DBError(Exception):
 class SqlDatabaseManager:
     settings = Settings().db
 
-    if settings.db_type == "sql":
-        database_url = SQL_URI_MAP["postgres"]
-        if not database_exists(database_url):
-            create_database(database_url)
+    database_url = SQL_URI_MAP["postgres"]
     pool_size = settings.pool_size
     max_overflow = settings.max_overflow
+    _database_checked = False
+    _database_lock = threading.Lock()
 
     def __init__(self):
         self._engine = None
@@ -42,6 +42,7 @@ class SqlDatabaseManager:
     def engine(self) -> Engine:
         try:
             if self._engine is None:
+                self._ensure_database()
                 self._engine = create_engine(
                     self.database_url,
                     pool_size=self.pool_size,
@@ -51,6 +52,17 @@ class SqlDatabaseManager:
         except Exception as e:
             raise DBError(f"Error creating DB engine: {e}") from e
 
+    @classmethod
+    def _ensure_database(cls):
+        # Checked once per process on first use, so importing db does not need a running server
+        if cls._database_checked:
+            return
+        with cls._database_lock:
+            if not cls._database_checked:
+                if cls.settings.db_type == "sql" and not database_exists(cls.database_url):
+                    create_database(cls.database_url)
+                cls._database_checked = True
+
     def session(self) -> Session:
         return Session(self.engine(), autoflush=False, autocommit=False)
 
@@ -3,3 +3,4 @@ from handlers.person_handler import PersonHandler
 from handlers.photo_handler import PhotoHandler
 from handlers.face_handler import FaceHandler
 from handlers.album_handler import AlbumHandler
+from handlers.photo_job_handler import PhotoJobHandler
@@ -0,0 +1,15 @@
+from typing import Type
+
+from db import DBConnection
+from db.config import Entity
+from models import Photo, PhotoJob
+from .base_handler import BaseHandler
+
+
+class PhotoJobHandler(BaseHandler):
+    def __init__(self, db_conn: Type[DBConnection]):
+        super().__init__(Entity.PHOTO_JOB, db_conn)
+
+    async def enqueue(self, photo: Photo) -> dict:
+        job = PhotoJob(photo_id=photo.id, owner_id=photo.owner_id)
+        return await self.create(job.model_dump())
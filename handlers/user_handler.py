@@ -51,7 +51,10 @@ class UserHandler(BaseHandler):
                 limit=limit,
                 page=page,
             )
-        return [Person(**person) for person in people]
+        return [
+            Person(**{key: value for key, value in person.items() if key != "faces"})
+            for person in people
+        ]
 
     async def get_user_faces(self, user_id: UUID, limit: int = 100, page: int = 0) -> list[Face]:
         with self.db_conn(entity=Entity.FACE) as conn:
@@ -3,16 +3,27 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
+from core.search import executor
 from routers import main_router
+from routers.dependencies.search_dependency import create_search_engine
+from settings import Settings
 import logging
 
 logging.getLogger("passlib").setLevel(logging.ERROR)
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     engine = init_db()
+    try:
+        app.state.search_engine = create_search_engine()
+    except Exception:
+        # Only search depends on Cohere and CLIP, the other routes must still come up
+        logger.exception("Search engine could not be created, retrying on the first search")
+        app.state.search_engine = None
     yield
+    executor.shutdown()
     if engine:
         engine.dispose()
 
@@ -39,7 +50,6 @@ def health():
 
 if __name__ == "__main__":
     import uvicorn
-    from settings import Settings
 
     settings = Settings()
 
@@ -1,4 +1,4 @@
-from models.tables import User, Photo, Album, Face, Person
+from models.tables import User, Photo, Album, Face, Person, PhotoJob
 from models.response_models import (
     UserResponse,
     PhotoResponse,
@@ -20,7 +20,7 @@ from sqlmodel import (
 from sqlalchemy.dialects import postgresql
 from passlib.context import CryptContext
 from models.link_tables import PhotoAlbumLink
-from types_ import DatastoreType
+from types_ import DatastoreType, JobStatus
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -179,3 +179,35 @@ class Album(SQLModel, table=True):
     class Config:
         from_attributes = True
         unique_fields = ("id",)
+
+
+class PhotoJob(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    photo_id: uuid.UUID = Field(nullable=False, index=True)
+    owner_id: uuid.UUID = Field(nullable=False, foreign_key="user.id")
+
+    status: JobStatus = Field(
+        default=JobStatus.PENDING, sa_column=Column(Enum(JobStatus), nullable=False, index=True)
+    )
+    attempts: int = Field(default=0)
+    error: Optional[str] = Field(default=None)
+    claimed_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+
+    created_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+    )
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(
+            DateTime(timezone=True),
+            server_default=func.now(),
+            onupdate=func.now(),
+            nullable=False,
+        ),
+    )
+
+    class Config:
+        unique_fields = ("id",)
@@ -1,34 +1,68 @@
-from typing import Any
+import uuid
+from typing import Any, Iterable, Optional
 from uuid import uuid4
 from collections import defaultdict
 
+import numpy as np
+
 from db.config import Entity
 from db.mongo_connect import MongoConnection
 from db.sql_connect import SqlConnection
 from core.loader.image_loader import ImageLoader
 from core.cluster.community_detection import CommunityDetector
+from core.cluster.incremental import IncrementalClusterer
+from core.cluster.knn_community_detection import KNNCommunityDetector
+from core.cluster.neighbours import IVFNeighbourIndex, QdrantNeighbourIndex
 from core.embed.face import FaceEmbedder
-from models import Face, Person
+from models import Face, Person, Photo
+from pymongo import UpdateOne
+from sqlalchemy import update
 from pipeline.pipeline_runner import PipelineRunner
+from pipeline.pipeline_utils import (
+    bulk_update_photos_mongo,
+    get_person_face_counts,
+    get_user_persons,
+)
 
 
 class FaceClusterRunner(PipelineRunner):
+    # Crops from one batch of images are embedded together, at roughly one to two faces per
+    # photo this many images are needed to fill an embed batch of 64 crops
+    default_batch_size = 48
+
     def __init__(self):
-        self.embedder = FaceEmbedder()
         super().__init__("face_cluster", "faces", [Entity.PERSON, Entity.PHOTO])
+        self.embedder = FaceEmbedder(
+            backend=self.settings.inference.face, precision=self.settings.inference.precision
+        )
+        self.embed_batch_size = 64
+
+    def task(self, local_file_paths: Iterable[str], embed_batch_size: int = 64, **kwargs):
+        self.embed_batch_size = embed_batch_size
+        return super().task(local_file_paths, **kwargs)
+
+    def supports_checkpointing(self, incremental: bool = False, **kwargs) -> bool:
+        # Communities are detected across the whole library, partial commits would split them
+        # unless new faces are first matched against the persons already committed
+        return incremental
 
     def preprocess_func(self, img):
         self.embedder.extract_and_embed(img)
         self.logger.info(f"Faces embedded for image {img.id}")
 
-    def execute(self, loader: ImageLoader, **kwargs) -> dict[str, Any]:
-        self.logger.info("Detecting communities")
-        detector = CommunityDetector(
-            threshold=kwargs.get("threshold", 0.7),
-            min_community_size=kwargs.get("min_community_size", 2),
-            init_max_size=kwargs.get("init_max_size", 5),
+    def preprocess_batch_func(self, imgs):
+        embedded = self.embedder.extract_and_embed_batch(
+            imgs, batch_size=self.embed_batch_size, with_return=True
         )
-        detector.fit(loader.image_data)
+        self.logger.info(f"{len(embedded)} faces embedded for {len(imgs)} images")
+
+    def execute(self, loader: ImageLoader, **kwargs) -> dict[str, Any]:
+        if kwargs.get("incremental"):
+            detector = self._fit_incremental(loader, **kwargs)
+        else:
+            self.logger.info("Detecting communities")
+            detector = self._build_detector(**kwargs)
+            detector.fit(loader.image_data)
 
         loader.update_face_index()
 
@@ -39,6 +73,51 @@ class FaceClusterRunner(PipelineRunner):
             "photos": kwargs.get("photos"),
         }
 
+    def _fit_incremental(self, loader: ImageLoader, **kwargs) -> IncrementalClusterer:
+        user = kwargs["user"]
+        persons = get_user_persons(user.id)
+        counts = get_person_face_counts([person.id for person in persons])
+        self.logger.info(f"Matching faces against {len(persons)} known persons")
+
+        detector = IncrementalClusterer(
+            match_threshold=kwargs.get("match_threshold", 0.72),
+            threshold=kwargs.get("threshold", 0.7),
+            min_community_size=kwargs.get("min_community_size", 2),
+            community_detector=self._build_detector(**kwargs),
+        )
+        detector.fit(
+            loader.image_data,
+            {person.id: np.asarray(person.centroid) for person in persons},
+            counts,
+        )
+        self.logger.info(
+            f"{sum(len(faces) for faces in detector.matches.values())} faces matched to known "
+            f"persons, {len(detector.clusters)} new communities detected"
+        )
+        return detector
+
+    def _build_detector(self, **kwargs) -> CommunityDetector:
+        if kwargs.get("cluster_backend", "exact") == "exact":
+            return CommunityDetector(
+                threshold=kwargs.get("threshold", 0.7),
+                min_community_size=kwargs.get("min_community_size", 2),
+                init_max_size=kwargs.get("init_max_size", 5),
+                block_size=kwargs.get("block_size"),
+            )
+
+        if kwargs.get("ann_index", "ivf") == "qdrant":
+            index = QdrantNeighbourIndex(owner_id=kwargs["user"].id)
+        else:
+            index = IVFNeighbourIndex(n_probe=kwargs.get("n_probe", 16))
+        return KNNCommunityDetector(
+            index=index,
+            n_neighbours=kwargs.get("neighbours", 32),
+            threshold=kwargs.get("threshold", 0.7),
+            min_community_size=kwargs.get("min_community_size", 2),
+            init_max_size=kwargs.get("init_max_size", 5),
+            block_size=kwargs.get("block_size") or 4096,
+        )
+
     def _update_sql(self, conn: SqlConnection, task_results: dict[str, Any], entity: Entity):
         if entity == Entity.PERSON:
             self._update_sql_persons(conn, task_results)
@@ -51,13 +130,15 @@ class FaceClusterRunner(PipelineRunner):
         elif entity == Entity.PHOTO:
             self._update_mongo_photos(conn, task_results)
 
-    def _update_sql_persons(self, conn: SqlConnection, task_results: dict[str, Any]):
+    def _build_faces(
+        self, task_results: dict[str, Any]
+    ) -> tuple[list[Person], list[Face], dict[uuid.UUID, set[uuid.UUID]]]:
         loader = task_results["loader"]
         detector = task_results["detector"]
         user = task_results["user"]
 
-        session = conn.session
         persons = []
+        matched_faces = []
         photo_id_person_map = defaultdict(set)
 
         for cluster, centroid in zip(detector.clusters, detector.centroids):
@@ -65,88 +146,121 @@ class FaceClusterRunner(PipelineRunner):
             person = Person(id=person_id, owner_id=user.id, centroid=centroid.tolist(), name=None)
             faces = []
             for photo_id, face_key in cluster:
-                fid = uuid4()
-                image_data = loader.image_data[photo_id]
-                face = image_data.faces[face_key]
-                face_obj = Face(
-                    id=fid,
-                    known=False,
-                    embedding=self.convert_float32_list_to_float(
-                        face["embedding"].flatten().tolist()
-                    ),
-                    score=float(face["score"]),
-                    bbox=self.convert_int32_list_to_int(face["facial_area"]),
-                    person=person,
-                    photo_id=photo_id,
-                )
-                faces.append(face_obj)
-                photo_id_person_map[photo_id].add(person)
+                faces.append(self._build_face(loader, photo_id, face_key, person=person))
+                photo_id_person_map[photo_id].add(person_id)
             person.faces = faces
             persons.append(person)
 
+        for person_id, members in getattr(detector, "matches", {}).items():
+            for photo_id, face_key in members:
+                matched_faces.append(
+                    self._build_face(loader, photo_id, face_key, person_id=person_id)
+                )
+                photo_id_person_map[photo_id].add(person_id)
+
+        return persons, matched_faces, photo_id_person_map
+
+    def _build_face(
+        self,
+        loader: ImageLoader,
+        photo_id: uuid.UUID,
+        face_key: str,
+        person: Optional[Person] = None,
+        person_id: Optional[uuid.UUID] = None,
+    ) -> Face:
+        image_data = loader.image_data[photo_id]
+        face = image_data.faces[face_key]
+        return Face(
+            id=uuid4(),
+            known=False,
+            embedding=self.convert_float32_list_to_float(face["embedding"].flatten().tolist()),
+            score=float(face["score"]),
+            bbox=self.convert_int32_list_to_int(face["facial_area"]),
+            person=person,
+            person_id=person.id if person else person_id,
+            photo_id=photo_id,
+        )
+
+    def _update_sql_persons(self, conn: SqlConnection, task_results: dict[str, Any]):
+        persons, matched_faces, photo_id_person_map = self._build_faces(task_results)
+        detector = task_results["detector"]
+
+        session = conn.session
         session.add_all(persons)
+        session.add_all(matched_faces)
+        for person_id, centroid in getattr(detector, "updated_centroids", {}).items():
+            stmt = (
+                update(Person)
+                .where(Person.id == person_id)  # type: ignore
+                .values(centroid=self.convert_float32_list_to_float(centroid.tolist()))
+            )
+            session.exec(stmt)  # type: ignore
         session.commit()
         session.close()
 
         task_results["photo_id_person_map"] = photo_id_person_map
 
     def _update_mongo_persons(self, conn: MongoConnection, task_results: dict[str, Any]):
-        loader = task_results["loader"]
+        persons, matched_faces, photo_id_person_map = self._build_faces(task_results)
         detector = task_results["detector"]
-        user = task_results["user"]
-
-        persons = []
-        photo_id_person_map = defaultdict(set)
 
-        for cluster, centroid in zip(detector.clusters, detector.centroids):
-            person_id = uuid4()
-            person = Person(id=person_id, owner_id=user.id, centroid=centroid.tolist(), name=None)
-            faces = []
-            for photo_id, face_key in cluster:
-                fid = uuid4()
-                image_data = loader.image_data[photo_id]
-                face = image_data.faces[face_key]
-                face_obj = Face(
-                    id=fid,
-                    known=False,
-                    embedding=self.convert_float32_list_to_float(
-                        face["embedding"].flatten().tolist()
-                    ),
-                    score=float(face["score"]),
-                    bbox=self.convert_int32_list_to_int(face["facial_area"]),
-                    person=person,
-                    photo_id=photo_id,
-                )
-                faces.append(face_obj)
-                photo_id_person_map[photo_id].add(person)
-            person.faces = faces
-            persons.append(person)
+        # Faces are embedded in their person document, there is no separate face collection
+        if persons:
+            conn.insert_many(
+                [
+                    {
+                        **person.model_dump(mode="json"),
+                        "faces": [face.model_dump(mode="json") for face in person.faces],
+                    }
+                    for person in persons
+                ]
+            )
 
-        conn.insert_many([person.model_dump() for person in persons])
+        operations: dict[uuid.UUID, dict[str, Any]] = defaultdict(dict)
+        for face in matched_faces:
+            push = operations[face.person_id].setdefault("$push", {"faces": {"$each": []}})
+            push["faces"]["$each"].append(face.model_dump(mode="json"))
+        for person_id, centroid in getattr(detector, "updated_centroids", {}).items():
+            operations[person_id]["$set"] = {
+                "centroid": self.convert_float32_list_to_float(centroid.tolist())
+            }
+        if operations:
+            conn.collection.bulk_write(
+                [
+                    UpdateOne({"id": str(person_id)}, operation)
+                    for person_id, operation in operations.items()
+                ],
+                ordered=False,
+            )
 
         task_results["photo_id_person_map"] = photo_id_person_map
 
     def _update_sql_photos(self, conn: SqlConnection, task_results: dict[str, Any]):
-        photo_id_person_map = task_results["photo_id_person_map"]
         photos = task_results["photos"]
 
         session = conn.session
-        for photo in photos:
-            photo.people = list(photo_id_person_map[photo.id])
-            photo.faces_processed = True
-            session.merge(photo)
+        stmt = (
+            update(Photo)
+            .where(Photo.id.in_([photo.id for photo in photos]))  # type: ignore
+            .values(faces_processed=True)
+        )
+        session.exec(stmt)  # type: ignore
         session.commit()
         session.close()
 
     def _update_mongo_photos(self, conn: MongoConnection, task_results: dict[str, Any]):
         photo_id_person_map = task_results["photo_id_person_map"]
+        photos = task_results["photos"]
 
-        for photo_id, people in photo_id_person_map.items():
-            result = conn.update(
-                {"id": photo_id}, {"people": list(people), "faces_processed": True}
-            )
-            if not result:
-                self.logger.error(f"Failed to update photo {photo_id}")
+        updates = {
+            photo.id: {
+                "people": [str(person_id) for person_id in photo_id_person_map.get(photo.id, [])],
+                "faces_processed": True,
+            }
+            for photo in photos
+        }
+        for photo_id in bulk_update_photos_mongo(conn, updates):
+            self.logger.error(f"Failed to update photo {photo_id}")
 
     @staticmethod
     def add_arguments(parser):
@@ -162,6 +276,46 @@ class FaceClusterRunner(PipelineRunner):
         parser.add_argument(
             "--init_max_size", type=int, default=5, help="Initial max size for community detection"
         )
+        parser.add_argument(
+            "--block_size",
+            type=int,
+            default=None,
+            help="Compare faces in blocks of this many rows instead of one N x N similarity matrix",
+        )
+        parser.add_argument(
+            "--cluster-backend",
+            choices=["exact", "ann"],
+            default="exact",
+            help="Compare every pair of faces, or cluster a k-nearest-neighbour graph",
+        )
+        parser.add_argument(
+            "--ann-index",
+            choices=["ivf", "qdrant"],
+            default="ivf",
+            help="Neighbour index for the ann backend, in-process IVF or the Qdrant collection",
+        )
+        parser.add_argument(
+            "--neighbours", type=int, default=32, help="Neighbours per face for the ann backend"
+        )
+        parser.add_argument("--n-probe", type=int, default=16, help="IVF lists searched per face")
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Match new faces against the user's existing persons before clustering leftovers",
+        )
+        parser.add_argument(
+            "--match_threshold",
+            type=float,
+            default=0.72,
+            help="Minimum similarity to assign a face to an existing person",
+        )
+        parser.add_argument(
+            "--embed-batch-size",
+            type=int,
+            default=64,
+            help="Maximum face crops per Facenet512 forward pass, crops are only pooled within one "
+            "--batch-size of images so raise both together",
+        )
 
     @staticmethod
     def convert_float32_list_to_float(data: list):
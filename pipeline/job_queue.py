@@ -0,0 +1,154 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from sqlalchemy import func, select, update
+
+from db import DB_CONNECTION_MAP
+from db.config import Entity
+from db.mongo_connect import MongoConnection
+from db.sql_connect import SqlConnection
+from models import PhotoJob
+from settings import Settings
+from types_ import JobStatus
+
+
+def _connection_class():
+    settings = Settings()
+    return DB_CONNECTION_MAP[settings.db.db_type]
+
+
+def claim_jobs(limit: int) -> list[PhotoJob]:
+    if limit <= 0:
+        return []
+
+    with _connection_class()(entity=Entity.PHOTO_JOB) as conn:
+        if isinstance(conn, SqlConnection):
+            # SKIP LOCKED lets several workers claim disjoint jobs without blocking each other
+            candidates = (
+                select(PhotoJob.id)
+                .where(PhotoJob.status == JobStatus.PENDING)
+                .order_by(PhotoJob.created_at)  # type: ignore
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            stmt = (
+                update(PhotoJob)
+                .where(PhotoJob.id.in_(candidates))  # type: ignore
+                .values(
+                    status=JobStatus.RUNNING,
+                    claimed_at=func.now(),
+                    attempts=PhotoJob.attempts + 1,
+                )
+                .returning(PhotoJob.id, PhotoJob.photo_id, PhotoJob.owner_id, PhotoJob.attempts)
+            )
+            session = conn.session
+            rows = session.execute(stmt).all()
+            session.commit()
+            session.close()
+            return [
+                PhotoJob(
+                    id=id,
+                    photo_id=photo_id,
+                    owner_id=owner_id,
+                    attempts=attempts,
+                    status=JobStatus.RUNNING,
+                )
+                for id, photo_id, owner_id, attempts in rows
+            ]
+        elif isinstance(conn, MongoConnection):
+            jobs = []
+            for _ in range(limit):
+                item = conn.collection.find_one_and_update(
+                    {"status": JobStatus.PENDING.value},
+                    {
+                        "$set": {
+                            "status": JobStatus.RUNNING.value,
+                            "claimed_at": datetime.now(timezone.utc),
+                        },
+                        "$inc": {"attempts": 1},
+                    },
+                    sort=[("_id", ASCENDING)],
+                    return_document=ReturnDocument.AFTER,
+                )
+                if item is None:
+                    break
+                jobs.append(PhotoJob.model_validate(item))
+            return jobs
+        else:
+            raise ValueError(f"Unsupported database connection type: {type(conn)}")
+
+
+def finish_jobs(job_ids: list[uuid.UUID], status: JobStatus, error: Optional[str] = None):
+    if not job_ids:
+        return
+
+    with _connection_class()(entity=Entity.PHOTO_JOB) as conn:
+        if isinstance(conn, SqlConnection):
+            session = conn.session
+            stmt = (
+                update(PhotoJob)
+                .where(PhotoJob.id.in_(job_ids))  # type: ignore
+                .values(status=status, error=error)
+            )
+            session.execute(stmt)
+            session.commit()
+            session.close()
+        elif isinstance(conn, MongoConnection):
+            conn.collection.update_many(
+                {"id": {"$in": [str(job_id) for job_id in job_ids]}},
+                {"$set": {"status": status.value, "error": error}},
+            )
+        else:
+            raise ValueError(f"Unsupported database connection type: {type(conn)}")
+
+
+def retry_or_fail_jobs(jobs: list[PhotoJob], error: str, max_attempts: int):
+    finish_jobs([job.id for job in jobs if job.attempts < max_attempts], JobStatus.PENDING, error)
+    finish_jobs([job.id for job in jobs if job.attempts >= max_attempts], JobStatus.FAILED, error)
+
+
+def release_stale_jobs(stale_after: float, max_attempts: int) -> tuple[int, int]:
+    # Jobs claimed by a worker that died are handed back to the queue, unless they have used up
+    # their attempts, a photo that keeps killing workers would otherwise be retried forever
+    cutoff = timedelta(seconds=stale_after)
+    error = "Worker stopped before the job finished"
+    with _connection_class()(entity=Entity.PHOTO_JOB) as conn:
+        if isinstance(conn, SqlConnection):
+            session = conn.session
+            counts = []
+            for attempts, status in (
+                (PhotoJob.attempts < max_attempts, JobStatus.PENDING),
+                (PhotoJob.attempts >= max_attempts, JobStatus.FAILED),
+            ):
+                stmt = (
+                    update(PhotoJob)
+                    .where(PhotoJob.status == JobStatus.RUNNING)
+                    .where(PhotoJob.claimed_at < func.now() - cutoff)  # type: ignore
+                    .where(attempts)
+                    .values(status=status, error=error)
+                    .returning(PhotoJob.id)
+                )
+                counts.append(len(session.execute(stmt).all()))
+            session.commit()
+            session.close()
+            return counts[0], counts[1]
+        elif isinstance(conn, MongoConnection):
+            counts = []
+            for attempts, status in (
+                ({"$lt": max_attempts}, JobStatus.PENDING),
+                ({"$gte": max_attempts}, JobStatus.FAILED),
+            ):
+                result = conn.collection.update_many(
+                    {
+                        "status": JobStatus.RUNNING.value,
+                        "claimed_at": {"$lt": datetime.now(timezone.utc) - cutoff},
+                        "attempts": attempts,
+                    },
+                    {"$set": {"status": status.value, "error": error}},
+                )
+                counts.append(result.modified_count)
+            return counts[0], counts[1]
+        else:
+            raise ValueError(f"Unsupported database connection type: {type(conn)}")
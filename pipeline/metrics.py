@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Generator, Iterable, Iterator, Optional, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+# Upper bounds of the per-item latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+HISTOGRAM_LABELS = [f"le_{bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + [
+    f"gt_{HISTOGRAM_BUCKETS_MS[-1]}ms"
+]
+
+_current: ContextVar[Optional["PipelineMetrics"]] = ContextVar("pipeline_metrics", default=None)
+
+
+class PipelineMetrics:
+    def __init__(self, task_name: str, metrics_file: Optional[str] = None):
+        self.task_name = task_name
+        self.metrics_file = metrics_file
+        self.run_id = uuid.uuid4().hex[:12]
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.totals: dict[str, float] = defaultdict(float)
+        self.counters: dict[str, int] = defaultdict(int)
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, items: int = 1):
+        with self._lock:
+            self.totals[stage] += seconds
+            # Batched stages are spread evenly over the items of the batch
+            self.samples[stage].extend([seconds / max(items, 1)] * max(items, 1))
+        self._write({"event": "timer", "stage": stage, "seconds": seconds, "items": items})
+
+    def incr(self, counter: str, value: int = 1):
+        with self._lock:
+            self.counters[counter] += value
+
+    @contextmanager
+    def timer(self, stage: str, items: int = 1) -> Generator[None, None, None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, items)
+
+    def timed_iter(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        # Records how long the consumer waits on each item, i.e. the queue wait of a producer
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start)
+            yield item
+
+    def summary(self) -> dict[str, Any]:
+        stages = {}
+        with self._lock:
+            for stage, samples in self.samples.items():
+                latencies = np.asarray(samples) * 1000
+                counts = np.histogram(latencies, bins=[0, *HISTOGRAM_BUCKETS_MS, np.inf])[0]
+                stages[stage] = {
+                    "total_seconds": self.totals[stage],
+                    "items": len(samples),
+                    "mean_ms": float(latencies.mean()),
+                    "p50_ms": float(np.percentile(latencies, 50)),
+                    "p95_ms": float(np.percentile(latencies, 95)),
+                    "max_ms": float(latencies.max()),
+                    "histogram": {
+                        label: int(count) for label, count in zip(HISTOGRAM_LABELS, counts)
+                    },
+                }
+            counters = dict(self.counters)
+
+        return {
+            "task": self.task_name,
+            "run_id": self.run_id,
+            "wall_seconds": time.perf_counter() - self._start,
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def emit(self, logger) -> dict[str, Any]:
+        summary = self.summary()
+        for stage, values in summary["stages"].items():
+            logger.info(
+                f"[{self.task_name}] {stage}: {values['total_seconds']:.2f}s total, "
+                f"{values['items']} items, p50 {values['p50_ms']:.1f}ms, "
+                f"p95 {values['p95_ms']:.1f}ms"
+            )
+        logger.info(f"[{self.task_name}] counters: {summary['counters']}")
+        self._write({"event": "summary", **summary})
+        return summary
+
+    def _write(self, record: dict[str, Any]):
+        if not self.metrics_file:
+            return
+        line = json.dumps(
+            {"time": time.time(), "task": self.task_name, "run_id": self.run_id, **record}
+        )
+        with self._lock:
+            with open(self.metrics_file, "a") as f:
+                f.write(line + "\n")
+
+
+def current_metrics() -> Optional[PipelineMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def use_metrics(metrics: PipelineMetrics) -> Generator[PipelineMetrics, None, None]:
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timer(stage: str, items: int = 1) -> Generator[None, None, None]:
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.timer(stage, items):
+        yield
+
+
+def observe(stage: str, seconds: float, items: int = 1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.observe(stage, seconds, items)
+
+
+def timed_iter(stage: str, iterable: Iterable[T]) -> Iterable[T]:
+    metrics = _current.get()
+    if metrics is None:
+        return iterable
+    return metrics.timed_iter(stage, iterable)
+
+
+def incr(counter: str, value: int = 1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.incr(counter, value)
+
+
+def submit(executor: Executor, func: Callable[..., T], *args, **kwargs) -> "Future[T]":
+    # Pool threads do not inherit context variables, each task runs in a copy of the caller's
+    return executor.submit(copy_context().run, func, *args, **kwargs)
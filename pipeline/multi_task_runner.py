@@ -0,0 +1,181 @@
+import uuid
+from typing import Any, Iterable, Optional
+
+from core.loader.image_loader import ImageLoader
+from db.config import Entity
+from db.mongo_connect import MongoConnection
+from db.sql_connect import SqlConnection
+from models import Photo, User
+from pipeline.face_cluster_runner import FaceClusterRunner
+from pipeline.metrics import timer
+from pipeline.object_detection_runner import ObjectDetectionRunner
+from pipeline.pipeline_runner import PipelineRunner
+from pipeline.pipeline_utils import (
+    bulk_update_photos_mongo,
+    bulk_update_photos_sql,
+    get_user_photos,
+)
+from pipeline.scene_detection_runner import SceneDetectionRunner
+
+STAGE_RUNNERS = {
+    "faces": FaceClusterRunner,
+    "objects": ObjectDetectionRunner,
+    "scene": SceneDetectionRunner,
+}
+
+
+class MultiTaskRunner(PipelineRunner):
+    default_batch_size = 8
+
+    def __init__(self, stages: Optional[list[str]] = None):
+        super().__init__("multi_task", "multi_task", [Entity.PERSON, Entity.PHOTO])
+        self.runners: dict[str, PipelineRunner] = {
+            column: runner_class() for column, runner_class in STAGE_RUNNERS.items()
+        }
+        self.stages = list(stages or STAGE_RUNNERS)
+        self.pending: dict[str, set[uuid.UUID]] = {column: set() for column in STAGE_RUNNERS}
+
+    def get_pending_photos(
+        self, user: User, stages: Optional[list[str]] = None, **kwargs
+    ) -> list[Photo]:
+        photos: dict[uuid.UUID, Photo] = {}
+        for column in stages or self.stages:
+            for photo in get_user_photos(user.id, column, self.settings.storage.datastore):
+                photos.setdefault(photo.id, photo)
+        return list(photos.values())
+
+    def supports_checkpointing(self, stages: Optional[list[str]] = None, **kwargs) -> bool:
+        if "faces" in (stages or self.stages):
+            return self.runners["faces"].supports_checkpointing(**kwargs)
+        return True
+
+    def task(
+        self,
+        local_file_paths: Iterable[str],
+        photos: list[Photo],
+        stages: Optional[list[str]] = None,
+        embed_batch_size: int = 64,
+        **kwargs,
+    ):
+        self.stages = list(stages or self.stages)
+        for column in self.stages:
+            self.pending[column].update(
+                photo.id for photo in photos if not getattr(photo, f"{column}_processed")
+            )
+        if "faces" in self.stages:
+            self.runners["faces"].embed_batch_size = embed_batch_size  # type: ignore
+
+        return super().task(local_file_paths, photos=photos, **kwargs)
+
+    def preprocess_func(self, img):
+        self.preprocess_batch_func([img])
+
+    def preprocess_batch_func(self, imgs):
+        for column in self.stages:
+            pending = [img for img in imgs if img.id in self.pending[column]]
+            if pending:
+                with timer(f"preprocess.{column}", len(pending)):
+                    self.runners[column].preprocess_batch_func(pending)
+
+    def execute(self, loader: ImageLoader, **kwargs) -> dict[str, Any]:
+        stage_results = {}
+        for column in self.stages:
+            self.logger.info(f"Executing {self.runners[column].task_name}")
+            with timer(f"execute.{column}"):
+                results = self.runners[column].execute(loader, **kwargs)
+            if column != "faces":
+                results = {
+                    img_id: result
+                    for img_id, result in results.items()
+                    if img_id in self.pending[column]
+                }
+            stage_results[column] = results
+
+        return {
+            "stages": stage_results,
+            "user": kwargs.get("user"),
+            "photos": kwargs.get("photos"),
+        }
+
+    def update_collections(self, task_results: dict[str, Any], connections: dict):
+        try:
+            super().update_collections(task_results, connections)
+        finally:
+            # Long-lived callers such as the scheduler reuse the runner across many chunks
+            photo_ids = {photo.id for photo in task_results["photos"]}
+            for pending in self.pending.values():
+                pending.difference_update(photo_ids)
+
+    def _update_sql(self, conn: SqlConnection, task_results: dict[str, Any], entity: Entity):
+        if entity == Entity.PERSON:
+            if "faces" in task_results["stages"]:
+                face_runner: FaceClusterRunner = self.runners["faces"]  # type: ignore
+                face_runner._update_sql_persons(conn, task_results["stages"]["faces"])
+        elif entity == Entity.PHOTO:
+            self._update_sql_photos(conn, task_results)
+
+    def _update_mongo(self, conn: MongoConnection, task_results: dict[str, Any], entity: Entity):
+        if entity == Entity.PERSON:
+            if "faces" in task_results["stages"]:
+                face_runner: FaceClusterRunner = self.runners["faces"]  # type: ignore
+                face_runner._update_mongo_persons(conn, task_results["stages"]["faces"])
+        elif entity == Entity.PHOTO:
+            self._update_mongo_photos(conn, task_results)
+
+    def _photo_updates(self, task_results: dict[str, Any]) -> dict[uuid.UUID, dict[str, Any]]:
+        stage_results = task_results["stages"]
+        updates = {}
+        for photo in task_results["photos"]:
+            values: dict[str, Any] = {"entities": []}
+            if photo.id in self.pending["objects"] and "objects" in stage_results:
+                objects = stage_results["objects"].get(photo.id, [])
+                values["objects"] = objects
+                values["entities"].extend(obj for obj, _ in objects)
+                values["objects_processed"] = True
+            if photo.id in self.pending["scene"] and "scene" in stage_results:
+                scenes = stage_results["scene"].get(photo.id, [])
+                values["scenes"] = scenes
+                values["entities"].extend(scene for scene, _ in scenes)
+                values["scene_processed"] = True
+            if photo.id in self.pending["faces"] and "faces" in stage_results:
+                values["faces_processed"] = True
+            if len(values) > 1:
+                updates[photo.id] = values
+        return updates
+
+    def _update_sql_photos(self, conn: SqlConnection, task_results: dict[str, Any]):
+        session = conn.session
+        failed = bulk_update_photos_sql(session, self._photo_updates(task_results))
+        for photo_id in failed:
+            self.logger.error(f"Failed to update {photo_id}")
+
+        session.commit()
+        session.close()
+
+    def _update_mongo_photos(self, conn: MongoConnection, task_results: dict[str, Any]):
+        photo_id_person_map = task_results["stages"].get("faces", {}).get("photo_id_person_map", {})
+        updates = self._photo_updates(task_results)
+        for photo_id, values in updates.items():
+            if values.get("faces_processed"):
+                people = photo_id_person_map.get(photo_id, [])
+                values["people"] = [str(person_id) for person_id in people]
+
+        failed = bulk_update_photos_mongo(conn, updates)
+        for photo_id in failed:
+            self.logger.error(f"Failed to update {photo_id}")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stages",
+            nargs="+",
+            choices=list(STAGE_RUNNERS),
+            default=list(STAGE_RUNNERS),
+            help="Stages to run on each decoded photo",
+        )
+        for runner in self.runners.values():
+            runner.add_arguments(parser)
+
+
+if __name__ == "__main__":
+    runner = MultiTaskRunner()
+    runner.run()
@@ -1,14 +1,17 @@
 from core.detect.object import ObjectDetector
 from db.mongo_connect import MongoConnection
 from db.sql_connect import SqlConnection
-from models import Photo
 from pipeline.pipeline_runner import PipelineRunner
+from pipeline.pipeline_utils import bulk_update_photos_mongo, bulk_update_photos_sql
 from db.config import Entity
-from sqlalchemy import func, update
+import uuid
 from typing import Any
 
 
 class ObjectDetectionRunner(PipelineRunner):
+    # Detectron2 inputs are full-size images, larger batches mostly add memory on CPU
+    default_batch_size = 4
+
     def __init__(self):
         super().__init__("object_detection", "objects", [Entity.PHOTO])
         self.detector = ObjectDetector()
@@ -17,6 +20,10 @@ class ObjectDetectionRunner(PipelineRunner):
         self.detector.detect(img, True)
         self.logger.info(f"Objects detected for image {img.id}")
 
+    def preprocess_batch_func(self, imgs):
+        self.detector.detect_batch(imgs, batch_size=len(imgs))
+        self.logger.info(f"Objects detected for {len(imgs)} images")
+
     def execute(self, loader, **kwargs):
         result = {}
         for img_id, img in loader.image_data.items():
@@ -26,46 +33,29 @@ class ObjectDetectionRunner(PipelineRunner):
             result[img_id] = objects
         return result
 
+    def _photo_updates(self, task_results: dict[str, Any]) -> dict[uuid.UUID, dict[str, Any]]:
+        return {
+            img_id: {
+                "objects": objects,
+                "entities": [label for label, _ in objects],
+                "objects_processed": True,
+            }
+            for img_id, objects in task_results.items()
+        }
+
     def _update_sql(self, conn: SqlConnection, task_results: dict[str, Any], entity: Entity):
         session = conn.session
-        for img_id, objects in task_results.items():
-            objs = []
-            for obj, score in objects:
-                objs.append(obj)
-
-            stmt = (
-                update(Photo)
-                .where(Photo.id == img_id)  # type: ignore
-                .values(objects=objects)
-                .values(entities=func.array_cat(Photo.entities, objs))
-                .values(objects_processed=True)
-                .returning(Photo)
-            )
-
-            result = session.exec(stmt).all()  # type: ignore
-
-            if len(result) == 0:
-                self.logger.error(f"Failed to update {img_id}")
+        failed = bulk_update_photos_sql(session, self._photo_updates(task_results))
+        for img_id in failed:
+            self.logger.error(f"Failed to update {img_id}")
 
         session.commit()
         session.close()
 
     def _update_mongo(self, conn: MongoConnection, task_results: dict[str, Any], entity: Entity):
-        for img_id, objects in task_results.items():
-            objs = []
-            for obj, score in objects:
-                objs.append(obj)
-
-            result = conn.collection.update_one(
-                {"id": img_id},
-                {
-                    "$set": {"objects": objects, "objects_processed": True},
-                    "$push": {"entities": {"$each": objs}},
-                },
-            )
-
-            if result.modified_count == 0:
-                self.logger.info(f"Failed to update {img_id}")
+        failed = bulk_update_photos_mongo(conn, self._photo_updates(task_results))
+        for img_id in failed:
+            self.logger.error(f"Failed to update {img_id}")
 
     @staticmethod
     def add_arguments(parser):
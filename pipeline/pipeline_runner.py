@@ -1,18 +1,57 @@
 import argparse
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Union
+import multiprocessing
+import time
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Iterable, Optional, Union
 
 from db.config import Entity
 from db.mongo_connect import MongoConnection
 from db.sql_connect import SqlConnection
-from pipeline.pipeline_utils import download_images, get_user, get_user_photos, logger
+from pipeline.metrics import (
+    PipelineMetrics,
+    incr,
+    observe,
+    submit,
+    timed_iter,
+    timer,
+    use_metrics,
+)
+from pipeline.pipeline_utils import (
+    batched,
+    get_user,
+    get_user_photos,
+    iter_download_images,
+    logger,
+)
 from settings import Settings
 from db import DB_CONNECTION_MAP
+from models import Photo, User
 from core.loader.image_loader import ImageLoader
+from core.types import ImageData
+
+_worker_runner: Optional["PipelineRunner"] = None
+
+
+def _init_worker(runner: "PipelineRunner"):
+    global _worker_runner
+    _worker_runner = runner
+
+
+def _preprocess_paths(paths: list[str], max_side: Optional[int] = None) -> list[dict[str, Any]]:
+    assert _worker_runner is not None, "Worker process was not initialised"
+    loader = ImageLoader(paths, auto_load=True, max_side=max_side)
+    try:
+        imgs = [img for _, img in loader.iter()]
+        _worker_runner.preprocess_batch_func(imgs)
+        return [img.to_result() for img in imgs]
+    finally:
+        loader.close()
 
 
 class PipelineRunner:
+    default_batch_size = 1
 
     def __init__(self, task_name: str, column: str, connection_requirements: list[Entity]):
         self.task_name = task_name
@@ -27,24 +66,107 @@ class PipelineRunner:
     def preprocess_func(self, img):
         raise NotImplementedError
 
-    def task(self, local_file_paths: list[str], num_workers: int = 4, **kwargs):
+    def preprocess_batch_func(self, imgs: list):
+        for img in imgs:
+            self.preprocess_func(img)
+
+    def task(
+        self,
+        local_file_paths: Iterable[str],
+        num_workers: int = 4,
+        stream: bool = False,
+        prefetch: int = 8,
+        batch_size: int = 1,
+        executor: str = "thread",
+        decode_max_side: Optional[int] = None,
+        **kwargs,
+    ):
         self.logger.info(f"Running {self.task_name}")
 
-        loader = ImageLoader(local_file_paths, auto_load=True)
-        self.logger.info("Starting preprocessing")
-        with ThreadPoolExecutor(max_workers=num_workers) as executor:
-            futures = [executor.submit(self.preprocess_func, img) for _, img in loader.iter()]
-            asyncio.get_event_loop().run_until_complete(
-                asyncio.gather(*[asyncio.wrap_future(f) for f in futures])
+        if executor == "process":
+            self.logger.info("Starting preprocessing (process pool)")
+            loader = self._preprocess_processes(
+                local_file_paths, num_workers, batch_size, decode_max_side
             )
+        elif stream:
+            loader = ImageLoader(local_file_paths, max_side=decode_max_side)
+            self.logger.info("Starting preprocessing (streaming)")
+            self._preprocess_stream(loader, num_workers, prefetch, batch_size)
+        else:
+            start = time.perf_counter()
+            loader = ImageLoader(local_file_paths, auto_load=True, max_side=decode_max_side)
+            observe("decode", time.perf_counter() - start, len(loader.image_data))
+            self.logger.info("Starting preprocessing")
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futures = [
+                    submit(executor, self._timed_preprocess, batch)
+                    for batch in batched((img for _, img in loader.iter()), batch_size)
+                ]
+                asyncio.get_event_loop().run_until_complete(
+                    asyncio.gather(*[asyncio.wrap_future(f) for f in futures])
+                )
         self.logger.info("Preprocessing completed")
 
         self.logger.info("Starting execution")
-        results = self.execute(loader, **kwargs)
+        with timer("execute"):
+            results = self.execute(loader, **kwargs)
         self.logger.info(f"{self.task_name} execution completed")
 
         return results
 
+    def _preprocess_stream(
+        self, loader: ImageLoader, num_workers: int, prefetch: int, batch_size: int
+    ):
+        max_in_flight = num_workers + 1
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            in_flight = set()
+            images = timed_iter("decode_wait", (img for _, img in loader.stream(prefetch=prefetch)))
+            for batch in batched(images, batch_size):
+                in_flight.add(submit(executor, self._preprocess_and_release, batch))
+                if len(in_flight) >= max_in_flight:
+                    with timer("worker_wait"):
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            for future in wait(in_flight).done:
+                future.result()
+
+    def _preprocess_processes(
+        self,
+        local_file_paths: Iterable[str],
+        num_workers: int,
+        batch_size: int,
+        decode_max_side: Optional[int] = None,
+    ) -> ImageLoader:
+        loader = ImageLoader([])
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self,),
+        ) as executor:
+            preprocess = partial(_preprocess_paths, max_side=decode_max_side)
+            batches = executor.map(preprocess, batched(local_file_paths, batch_size))
+            # Workers keep their own timings, the parent only sees how long it waits per batch
+            for results in timed_iter("preprocess_wait", batches):
+                incr("images", len(results))
+                for result in results:
+                    image_data = ImageData.from_result(result)
+                    loader.image_data[image_data.id] = image_data
+        return loader
+
+    def _timed_preprocess(self, imgs: list):
+        with timer("preprocess", len(imgs)):
+            self.preprocess_batch_func(imgs)
+        incr("images", len(imgs))
+
+    def _preprocess_and_release(self, imgs: list):
+        try:
+            self._timed_preprocess(imgs)
+        finally:
+            for img in imgs:
+                img.release()
+
     def update_collections(
         self,
         task_results: dict[str, Any],
@@ -52,10 +174,11 @@ class PipelineRunner:
     ):
         for entity, conn in connections.items():
             self.logger.info(f"Updating {entity.name} collection")
-            if isinstance(conn, SqlConnection):
-                self._update_sql(conn, task_results, entity)
-            elif isinstance(conn, MongoConnection):
-                self._update_mongo(conn, task_results, entity)
+            with timer(f"db_write.{entity.value}"):
+                if isinstance(conn, SqlConnection):
+                    self._update_sql(conn, task_results, entity)
+                elif isinstance(conn, MongoConnection):
+                    self._update_mongo(conn, task_results, entity)
 
         self.logger.info("Collections updated")
 
@@ -65,22 +188,24 @@ class PipelineRunner:
     def _update_mongo(self, conn: MongoConnection, task_results: dict[str, Any], entity: Entity):
         raise NotImplementedError
 
-    def run(self):
-        parser = argparse.ArgumentParser(description=f"{self.task_name} pipeline")
-        parser.add_argument("--user-id", type=str, required=True, help="User ID")
-        parser.add_argument("--num-workers", type=int, default=4, help="Number of workers")
-        self.add_arguments(parser)
-        args = parser.parse_args()
+    def get_pending_photos(self, user: User, **kwargs) -> list[Photo]:
+        return get_user_photos(user.id, self.column, self.settings.storage.datastore)
 
-        user = get_user(args.user_id)
-        photos = get_user_photos(user.id, self.column, self.settings.storage.datastore)
-        if len(photos) == 0:
-            self.logger.info("No photos to process")
-            return
+    def supports_checkpointing(self, **kwargs) -> bool:
+        return True
 
-        local_file_paths = download_images(user, photos)
-
-        task_results = self.task(local_file_paths, user=user, photos=photos, **vars(args))
+    def process(
+        self,
+        user: User,
+        photos: list[Photo],
+        commit_every: int = 0,
+        download_workers: int = 8,
+        metrics_file: Optional[str] = None,
+        **kwargs,
+    ):
+        if commit_every and not self.supports_checkpointing(**kwargs):
+            self.logger.warning(f"{self.task_name} cannot commit partial results, ignoring")
+            commit_every = 0
 
         db_type = self.settings.db.db_type
         connection_class = DB_CONNECTION_MAP[db_type]
@@ -89,11 +214,93 @@ class PipelineRunner:
         for entity in self.connection_requirements:
             connections[entity] = connection_class(entity=entity)
 
-        try:
-            self.update_collections(task_results, connections)
-        finally:
-            for conn in connections.values():
-                conn.close()
+        metrics = PipelineMetrics(self.task_name, metrics_file)
+        with use_metrics(metrics):
+            try:
+                committed = 0
+                for chunk in batched(photos, commit_every or len(photos)):
+                    # Streaming decodes each photo as it lands so download overlaps with inference
+                    local_file_paths = timed_iter(
+                        "download_wait", iter_download_images(user, chunk, download_workers)
+                    )
+                    if not kwargs.get("stream"):
+                        local_file_paths = list(local_file_paths)
+
+                    task_results = self.task(local_file_paths, user=user, photos=chunk, **kwargs)
+
+                    self.update_collections(task_results, connections)
+                    committed += len(chunk)
+                    incr("photos_committed", len(chunk))
+                    self.logger.info(f"Committed {committed}/{len(photos)} photos")
+            finally:
+                for conn in connections.values():
+                    conn.close()
+                metrics.emit(self.logger)
+
+    def add_pipeline_arguments(self, parser: argparse.ArgumentParser):
+        parser.add_argument("--num-workers", type=int, default=4, help="Number of workers")
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Stream images through a bounded prefetch window instead of loading all upfront",
+        )
+        parser.add_argument(
+            "--prefetch",
+            type=int,
+            default=8,
+            help="Number of decoded images to buffer when streaming",
+        )
+        parser.add_argument(
+            "--executor",
+            choices=["thread", "process"],
+            default="thread",
+            help="Run preprocessing in a thread pool or in worker processes that load models once",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=self.default_batch_size,
+            help="Number of images handed to the model per forward pass",
+        )
+        parser.add_argument(
+            "--decode-max-side",
+            type=int,
+            default=None,
+            help="Decode photos at a reduced resolution whose longest side is at least this size",
+        )
+        parser.add_argument(
+            "--download-workers",
+            type=int,
+            default=8,
+            help="Number of photos downloaded from the datastore concurrently",
+        )
+        parser.add_argument(
+            "--commit-every",
+            type=int,
+            default=0,
+            help="Commit results every N photos so an interrupted run can resume (0 = at the end)",
+        )
+        parser.add_argument(
+            "--metrics-file",
+            type=str,
+            default=None,
+            help="Append per-stage timings and the end-of-run summary to this JSONL file",
+        )
+        self.add_arguments(parser)
+
+    def run(self):
+        parser = argparse.ArgumentParser(description=f"{self.task_name} pipeline")
+        parser.add_argument("--user-id", type=str, required=True, help="User ID")
+        self.add_pipeline_arguments(parser)
+        args = parser.parse_args()
+
+        user = get_user(args.user_id)
+        photos = self.get_pending_photos(user, **vars(args))
+        if len(photos) == 0:
+            self.logger.info("No photos to process")
+            return
+
+        self.process(user, photos, **vars(args))
 
     def add_arguments(self, parser: argparse.ArgumentParser):
         pass
@@ -1,15 +1,20 @@
 import os
 import logging
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any
-from google.cloud import storage
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Iterable, Iterator, TypeVar
 import uuid
+from itertools import islice
 from typing import Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from sqlalchemy import cast, column, func, select, update, values
+from sqlmodel import Session
 from db import DB_CONNECTION_MAP
 from db.config import Entity
+from db.mongo_connect import MongoConnection
+from db.sql_connect import SqlConnection
 from datastore import BaseDataStore
-from models import User, Photo
+from models import Face, Person, User, Photo
 from settings import Settings
 from types_ import DatastoreType
 
@@ -19,55 +24,65 @@ logger = logging.getLogger(__name__)
 
 LOCAL_STORAGE_PATH = "./data/images"
 
+T = TypeVar("T")
 
-def download_image(bucket_name: str, file_path: str):
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(file_path)
-    blob.download_to_filename(f"{LOCAL_STORAGE_PATH}/{file_path}")
-    logger.info(f"Downloaded {file_path}")
 
-
-def download_batch(batch_index: int, bucket_name: str, file_paths: list[str], num_workers: int = 4):
-    event_loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
-        for file_path in file_paths:
-            event_loop.run_in_executor(executor, download_image, bucket_name, file_path)
-    logger.info(f"Batch {batch_index} downloaded - {len(file_paths)} images")
+def batched(iterable: Iterable[T], n: int) -> Iterator[list[T]]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, max(n, 1))):
+        yield batch
 
 
-def download_images(user: User, photos: list[Photo]) -> list[str]:
+def get_datastore(user: User) -> BaseDataStore:
     settings = Settings()
     datastore_class = settings.storage.datastore_class
     datastore_settings = settings.storage.datastore_settings
-    datastore: BaseDataStore = datastore_class(user, **datastore_settings)
+    return datastore_class(user, **datastore_settings)
+
+
+def download_photo(datastore: BaseDataStore, file_id: str, local_path: str) -> Optional[str]:
+    file_path = datastore.download_to_file(file_id, local_path)
+    if file_path is None:
+        logger.warning(f"Photo {file_id} not found in {datastore.datastore_type.value} datastore")
+    else:
+        logger.info(f"Downloaded {file_id}")
+    return file_path
+
+
+def iter_download_images(
+    user: User, photos: Iterable[Photo], num_workers: int = 8
+) -> Iterator[str]:
+    datastore = get_datastore(user)
 
     local_path = f"{LOCAL_STORAGE_PATH}/{user.id}"
+    os.makedirs(local_path, exist_ok=True)
 
-    if not os.path.exists(local_path):
-        os.makedirs(local_path)
-
-    file_paths = []
-    for photo in photos:
-        fid = str(photo.id)
-        fpath = datastore.get_file_path(fid)
-        if fpath.startswith("http"):
-            content, content_type = datastore.download(fid)
-            if content and content_type:
-                ext = content_type.split("/")[-1]
-                local_path = f"{local_path}/{fid}.{ext}"
-                with open(local_path, "wb") as f:
-                    f.write(content)
-                logger.info(f"Downloaded {fid}")
-                file_paths.append(local_path)
-        else:
-            file_paths.append(fpath)
-            logger.info(f"Using local file {fid}")
+    # Keep a bounded window of requests in flight and yield paths in completion order
+    file_ids = (str(photo.id) for photo in photos)
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        in_flight: set[Future] = set()
+        try:
+            while True:
+                for file_id in islice(file_ids, 2 * num_workers - len(in_flight)):
+                    in_flight.add(executor.submit(download_photo, datastore, file_id, local_path))
+                if not in_flight:
+                    return
 
-    return file_paths
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = future.result()
+                    if file_path is not None:
+                        yield file_path
+        finally:
+            for future in in_flight:
+                future.cancel()
 
 
-def get_user(user_id: str) -> User:
+def download_images(user: User, photos: list[Photo], num_workers: int = 8) -> list[str]:
+    return list(iter_download_images(user, photos, num_workers))
+
+
+def find_user(user_id: str) -> Optional[User]:
     settings = Settings()
     db_type = settings.db.db_type
     connection_class = DB_CONNECTION_MAP[db_type]
@@ -76,19 +91,20 @@ def get_user(user_id: str) -> User:
         user = conn.find({"id": user_id})
 
     if not user:
+        return None
+    return User(**user[0])
+
+
+def get_user(user_id: str) -> User:
+    user = find_user(user_id)
+    if user is None:
         logger.error("User not found")
         exit(1)
-
-    user = user[0]
-    return User(**user)
+    return user
 
 
 def get_file_paths(user: User) -> list[str]:
-    settings = Settings()
-    datastore_class = settings.storage.datastore_class
-    datastore_settings = settings.storage.datastore_settings
-    datastore: BaseDataStore = datastore_class(user, **datastore_settings)
-    return datastore.list_files()
+    return get_datastore(user).list_files()
 
 
 def get_user_photos(
@@ -111,3 +127,180 @@ def get_user_photos(
         photos = conn.find(query)
 
     return [Photo(**photo) for photo in photos]
+
+
+def get_photos(photo_ids: list[uuid.UUID]) -> list[Photo]:
+    settings = Settings()
+    db_type = settings.db.db_type
+    connection_class = DB_CONNECTION_MAP[db_type]
+
+    if not photo_ids:
+        return []
+
+    with connection_class(entity=Entity.PHOTO) as conn:
+        if isinstance(conn, SqlConnection):
+            photos = conn.find({"id": ("in", photo_ids)}, limit=len(photo_ids))
+        elif isinstance(conn, MongoConnection):
+            query = {"id": {"$in": [str(photo_id) for photo_id in photo_ids]}}
+            photos = conn.find(query, limit=len(photo_ids))
+        else:
+            raise ValueError(f"Unsupported database connection type: {type(conn)}")
+
+    return [Photo(**photo) for photo in photos]
+
+
+def find_all(conn, query: dict, page_size: int = 1000) -> list[dict]:
+    # Keyset pages on id stay stable when rows are written between pages, unlike offsets
+    items = []
+    page_query = dict(query)
+    while True:
+        page_items = conn.find(page_query, limit=page_size, sort="id")
+        items.extend(page_items)
+        if len(page_items) < page_size:
+            return items
+        last_id = page_items[-1]["id"]
+        page_query["id"] = {"$gt": last_id} if isinstance(conn, MongoConnection) else (">", last_id)
+
+
+def get_pending_photos_by_user(
+    columns: list[str], datastore: Optional[DatastoreType] = None
+) -> dict[uuid.UUID, list[Photo]]:
+    settings = Settings()
+    db_type = settings.db.db_type
+    connection_class = DB_CONNECTION_MAP[db_type]
+
+    photos: dict[uuid.UUID, Photo] = {}
+    with connection_class(entity=Entity.PHOTO) as conn:
+        for stage in columns:
+            query: dict[str, Any] = {f"{stage}_processed": False}
+            if datastore is not None:
+                query["datastore"] = datastore
+
+            for item in find_all(conn, query):
+                photo = Photo(**item)
+                photos.setdefault(photo.id, photo)
+
+    by_user: dict[uuid.UUID, list[Photo]] = {}
+    for photo in photos.values():
+        by_user.setdefault(photo.owner_id, []).append(photo)
+    return by_user
+
+
+def get_user_persons(user_id: uuid.UUID) -> list[Person]:
+    settings = Settings()
+    db_type = settings.db.db_type
+    connection_class = DB_CONNECTION_MAP[db_type]
+
+    with connection_class(entity=Entity.PERSON) as conn:
+        persons = find_all(conn, {"owner_id": user_id})
+
+    # Mongo person documents carry their embedded faces, which are not Person columns
+    return [
+        Person(**{key: value for key, value in person.items() if key != "faces"})
+        for person in persons
+    ]
+
+
+def get_person_face_counts(person_ids: list[uuid.UUID]) -> dict[uuid.UUID, int]:
+    settings = Settings()
+    db_type = settings.db.db_type
+    connection_class = DB_CONNECTION_MAP[db_type]
+
+    if not person_ids:
+        return {}
+
+    # Mongo embeds faces in their person document instead of a separate collection
+    entity = Entity.PERSON if connection_class is MongoConnection else Entity.FACE
+    with connection_class(entity=entity) as conn:
+        if isinstance(conn, SqlConnection):
+            session = conn.session
+            stmt = (
+                select(Face.person_id, func.count())
+                .where(Face.person_id.in_(person_ids))  # type: ignore
+                .group_by(Face.person_id)
+            )
+            counts = {person_id: count for person_id, count in session.execute(stmt).all()}
+            session.close()
+        elif isinstance(conn, MongoConnection):
+            result = conn.collection.aggregate(
+                [
+                    {"$match": {"id": {"$in": [str(id) for id in person_ids]}}},
+                    {"$project": {"id": 1, "count": {"$size": {"$ifNull": ["$faces", []]}}}},
+                ]
+            )
+            counts = {uuid.UUID(str(item["id"])): item["count"] for item in result}
+        else:
+            raise ValueError(f"Unsupported database connection type: {type(conn)}")
+
+    return counts
+
+
+def bulk_update_photos_sql(
+    session: Session, updates: dict[uuid.UUID, dict[str, Any]], batch_size: int = 1000
+) -> list[uuid.UUID]:
+    # Entities are appended to the existing array, every other value replaces the column
+    groups: dict[tuple[str, ...], list[uuid.UUID]] = {}
+    for photo_id, photo_values in updates.items():
+        groups.setdefault(tuple(sorted(photo_values)), []).append(photo_id)
+
+    table = Photo.__table__  # type: ignore
+    failed = []
+    for names, photo_ids in groups.items():
+        for batch in batched(photo_ids, batch_size):
+            rows = values(
+                column("id", table.c.id.type),
+                *[column(name, table.c[name].type) for name in names],
+                name="photo_updates",
+            ).data([(photo_id, *[updates[photo_id][name] for name in names]) for photo_id in batch])
+
+            assignments: dict[str, Any] = {
+                name: cast(rows.c[name], table.c[name].type) for name in names
+            }
+            if "entities" in assignments:
+                assignments["entities"] = func.array_cat(Photo.entities, assignments["entities"])
+
+            stmt = (
+                update(Photo)
+                .where(Photo.id == rows.c.id)  # type: ignore
+                .values(**assignments)
+                .returning(Photo.id)
+            )
+            updated = set(session.execute(stmt).scalars().all())
+            failed.extend(photo_id for photo_id in batch if photo_id not in updated)
+
+    return failed
+
+
+def bulk_update_photos_mongo(
+    conn: MongoConnection, updates: dict[uuid.UUID, dict[str, Any]], batch_size: int = 1000
+) -> list[uuid.UUID]:
+    failed = []
+    for batch in batched(list(updates), batch_size):
+        operations = []
+        for photo_id in batch:
+            photo_values = dict(updates[photo_id])
+            entities = photo_values.pop("entities", None)
+            operation: dict[str, Any] = {"$set": photo_values}
+            if entities is not None:
+                operation["$push"] = {"entities": {"$each": entities}}
+            operations.append(UpdateOne({"id": str(photo_id)}, operation))
+
+        errored = set()
+        try:
+            result = conn.collection.bulk_write(operations, ordered=False)
+            matched = result.matched_count
+        except BulkWriteError as e:
+            errored = {error["index"] for error in e.details["writeErrors"]}
+            matched = e.details["nMatched"]
+
+        failed.extend(batch[index] for index in sorted(errored))
+        if matched + len(errored) < len(batch):
+            # bulk_write only reports counts, look up which photos did not match
+            remaining = [str(photo_id) for i, photo_id in enumerate(batch) if i not in errored]
+            found = {
+                item["id"]
+                for item in conn.collection.find({"id": {"$in": remaining}}, {"id": 1, "_id": 0})
+            }
+            failed.extend(uuid.UUID(photo_id) for photo_id in remaining if photo_id not in found)
+
+    return failed
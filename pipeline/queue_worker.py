@@ -0,0 +1,144 @@
+import argparse
+import time
+import uuid
+from typing import Optional
+
+from models import PhotoJob
+from pipeline.job_queue import claim_jobs, finish_jobs, release_stale_jobs, retry_or_fail_jobs
+from pipeline.multi_task_runner import MultiTaskRunner
+from pipeline.pipeline_utils import find_user, get_photos, logger
+from types_ import JobStatus
+
+
+class QueueWorker:
+    def __init__(
+        self,
+        runner: Optional[MultiTaskRunner] = None,
+        queue_batch_size: int = 32,
+        max_wait: float = 2.0,
+        poll_interval: float = 1.0,
+        max_attempts: int = 3,
+        stale_after: float = 600.0,
+    ):
+        self.runner = runner or MultiTaskRunner()
+        self.queue_batch_size = queue_batch_size
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+        self.logger = logger
+
+    def collect(self) -> list[PhotoJob]:
+        jobs = claim_jobs(self.queue_batch_size)
+        if not jobs:
+            return []
+
+        # Uploads arrive in bursts, wait briefly so the models see a batch instead of one photo
+        deadline = time.monotonic() + self.max_wait
+        while len(jobs) < self.queue_batch_size and time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+            jobs.extend(claim_jobs(self.queue_batch_size - len(jobs)))
+        return jobs
+
+    def drain_once(self, stages: Optional[list[str]] = None, **kwargs) -> int:
+        jobs = self.collect()
+        if not jobs:
+            return 0
+
+        stages = list(stages or self.runner.stages)
+        if "faces" in stages:
+            # Each micro-batch extends the user's existing persons instead of reclustering
+            kwargs["incremental"] = True
+
+        photos = {photo.id: photo for photo in get_photos([job.photo_id for job in jobs])}
+        jobs_by_user: dict[uuid.UUID, list[PhotoJob]] = {}
+        for job in jobs:
+            jobs_by_user.setdefault(job.owner_id, []).append(job)
+
+        for owner_id, user_jobs in jobs_by_user.items():
+            pending = [
+                photos[job.photo_id]
+                for job in user_jobs
+                if job.photo_id in photos
+                and any(not getattr(photos[job.photo_id], f"{c}_processed") for c in stages)
+            ]
+            try:
+                if pending:
+                    user = find_user(str(owner_id))
+                    if user is None:
+                        # Retrying cannot help, and exiting would stop every other user's jobs
+                        self.logger.warning(f"User {owner_id} not found, failing their jobs")
+                        finish_jobs(
+                            [job.id for job in user_jobs], JobStatus.FAILED, "User not found"
+                        )
+                        continue
+                    self.runner.process(user, pending, stages=stages, **kwargs)
+            except Exception as e:
+                self.logger.exception(f"Failed to process {len(pending)} photos for {owner_id}")
+                retry_or_fail_jobs(user_jobs, str(e), self.max_attempts)
+                continue
+
+            finish_jobs([job.id for job in user_jobs], JobStatus.DONE)
+            self.logger.info(f"Processed {len(pending)} queued photos for user {owner_id}")
+
+        return len(jobs)
+
+    def release_stale(self):
+        released, failed = release_stale_jobs(self.stale_after, self.max_attempts)
+        if released:
+            self.logger.warning(f"Released {released} stale jobs back to the queue")
+        if failed:
+            self.logger.warning(f"Failed {failed} stale jobs after {self.max_attempts} attempts")
+
+    def run_forever(self, **kwargs):
+        while True:
+            self.release_stale()
+            if self.drain_once(**kwargs) == 0:
+                time.sleep(self.poll_interval)
+
+    def run(self):
+        parser = argparse.ArgumentParser(description="Photo job queue worker")
+        parser.add_argument(
+            "--queue-batch-size",
+            type=int,
+            default=32,
+            help="Maximum number of queued photos processed together",
+        )
+        parser.add_argument(
+            "--max-wait",
+            type=float,
+            default=2.0,
+            help="Seconds to wait for a micro-batch to fill once the first job is claimed",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=1.0, help="Seconds between queue polls"
+        )
+        parser.add_argument(
+            "--max-attempts", type=int, default=3, help="Attempts before a job is marked failed"
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=float,
+            default=600.0,
+            help="Seconds after which a running job is assumed lost and queued again",
+        )
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+        self.runner.add_pipeline_arguments(parser)
+        args = vars(parser.parse_args())
+
+        self.queue_batch_size = args.pop("queue_batch_size")
+        self.max_wait = args.pop("max_wait")
+        self.poll_interval = args.pop("poll_interval")
+        self.max_attempts = args.pop("max_attempts")
+        self.stale_after = args.pop("stale_after")
+        if args.pop("once"):
+            self.release_stale()
+            while self.drain_once(**args):
+                pass
+        else:
+            self.run_forever(**args)
+
+
+if __name__ == "__main__":
+    worker = QueueWorker()
+    worker.run()
@@ -2,22 +2,30 @@ from core.loader.image_loader import ImageLoader
 from core.detect.scene import SceneDetector
 from db.mongo_connect import MongoConnection
 from db.sql_connect import SqlConnection
-from models import Photo
 from pipeline.pipeline_runner import PipelineRunner
+from pipeline.pipeline_utils import bulk_update_photos_mongo, bulk_update_photos_sql
 from db.config import Entity
-from sqlalchemy import func, update
+import uuid
 from typing import Any
 
 
 class SceneDetectionRunner(PipelineRunner):
+    default_batch_size = 16
+
     def __init__(self):
         super().__init__("scene_detection", "scene", [Entity.PHOTO])
-        self.detector = SceneDetector()
+        self.detector = SceneDetector(
+            backend=self.settings.inference.scene, precision=self.settings.inference.precision
+        )
 
     def preprocess_func(self, img):
         self.detector.detect(img, True)
         self.logger.info(f"Scenes detected for image {img.id}")
 
+    def preprocess_batch_func(self, imgs):
+        self.detector.detect_batch(imgs, batch_size=len(imgs))
+        self.logger.info(f"Scenes detected for {len(imgs)} images")
+
     def execute(self, loader: ImageLoader, **kwargs) -> dict[str, Any]:
         results = {}
         for img_id, img in loader.iter():
@@ -28,45 +36,29 @@ class SceneDetectionRunner(PipelineRunner):
 
         return results
 
+    def _photo_updates(self, task_results: dict[str, Any]) -> dict[uuid.UUID, dict[str, Any]]:
+        return {
+            img_id: {
+                "scenes": scenes,
+                "entities": [label for label, _ in scenes],
+                "scene_processed": True,
+            }
+            for img_id, scenes in task_results.items()
+        }
+
     def _update_sql(self, conn: SqlConnection, task_results: dict[str, Any], entity: Entity):
         session = conn.session
-        for img_id, scenes in task_results.items():
-            scs = []
-            for scene, score in scenes:
-                scs.append(scene)
-
-            stmt = (
-                update(Photo)
-                .where(Photo.id == img_id)  # type: ignore
-                .values(scenes=scenes)
-                .values(entities=func.array_cat(Photo.entities, scs))
-                .values(scene_processed=True)
-                .returning(Photo)
-            )
-
-            result = session.exec(stmt).all()  # type: ignore
-
-            if len(result) == 0:
-                self.logger.error(f"Failed to update {img_id}")
+        failed = bulk_update_photos_sql(session, self._photo_updates(task_results))
+        for img_id in failed:
+            self.logger.error(f"Failed to update {img_id}")
 
         session.commit()
+        session.close()
 
     def _update_mongo(self, conn: MongoConnection, task_results: dict[str, Any], entity: Entity):
-        for img_id, scenes in task_results.items():
-            scs = []
-            for scene, score in scenes:
-                scs.append(scene)
-
-            result = conn.collection.update_one(
-                {"id": img_id},
-                {
-                    "$set": {"scenes": scenes, "scenes_processed": True},
-                    "$push": {"entities": {"$each": scs}},
-                },
-            )
-
-            if result.modified_count == 0:
-                self.logger.info(f"Failed to update {img_id}")
+        failed = bulk_update_photos_mongo(conn, self._photo_updates(task_results))
+        for img_id in failed:
+            self.logger.error(f"Failed to update {img_id}")
 
     @staticmethod
     def add_arguments(parser):
@@ -0,0 +1,152 @@
+import argparse
+import queue
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from models import Photo, User
+from pipeline.multi_task_runner import MultiTaskRunner
+from pipeline.pipeline_utils import find_user, get_pending_photos_by_user, logger
+
+
+class PipelineScheduler:
+    def __init__(
+        self,
+        runner: Optional[MultiTaskRunner] = None,
+        max_concurrent: int = 2,
+        slice_size: int = 64,
+        runner_factory: Callable[[], MultiTaskRunner] = MultiTaskRunner,
+    ):
+        self.runner = runner or runner_factory()
+        self.runner_factory = runner_factory
+        self.max_concurrent = max_concurrent
+        self.slice_size = slice_size
+        self.logger = logger
+        # Runners keep per-task state, so each slice in flight takes its own runner. Models come
+        # from the shared registry and are only loaded once however many runners there are
+        self._idle_runners: queue.SimpleQueue[MultiTaskRunner] = queue.SimpleQueue()
+        self._idle_runners.put(self.runner)
+
+    def _process(self, user: User, photos: list[Photo], **kwargs):
+        try:
+            runner = self._idle_runners.get_nowait()
+        except queue.Empty:
+            runner = self.runner_factory()
+        try:
+            return runner.process(user, photos, **kwargs)
+        finally:
+            self._idle_runners.put(runner)
+
+    def run_once(self, stages: Optional[list[str]] = None, **kwargs) -> int:
+        stages = list(stages or self.runner.stages)
+        if "faces" in stages and not kwargs.get("incremental"):
+            # Libraries are processed in slices, faces must be matched against committed persons
+            self.logger.info("Face clustering runs incrementally under the scheduler")
+            kwargs["incremental"] = True
+
+        queues = {
+            user_id: deque(photos)
+            for user_id, photos in get_pending_photos_by_user(
+                stages, self.runner.settings.storage.datastore
+            ).items()
+        }
+        if not queues:
+            self.logger.info("No photos to process")
+            return 0
+
+        total = sum(len(queue) for queue in queues.values())
+        self.logger.info(f"{total} pending photos across {len(queues)} users")
+
+        users: dict[uuid.UUID, Optional[User]] = {}
+        processed = 0
+        # A user is either waiting in `ready` or has exactly one slice in flight, so a large
+        # library only ever gets one turn per round and persons are never created concurrently
+        ready = deque(sorted(queues, key=lambda user_id: len(queues[user_id])))
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            in_flight: dict[Future, tuple[uuid.UUID, int]] = {}
+            while ready or in_flight:
+                while ready and len(in_flight) < self.max_concurrent:
+                    user_id = ready.popleft()
+                    if user_id not in users:
+                        users[user_id] = find_user(str(user_id))
+                    user = users[user_id]
+                    if user is None:
+                        # Photos of a deleted user must not stop the other users' processing
+                        self.logger.warning(f"User {user_id} not found, skipping their photos")
+                        queues[user_id].clear()
+                        continue
+
+                    user_queue = queues[user_id]
+                    photos: list[Photo] = [
+                        user_queue.popleft() for _ in range(min(self.slice_size, len(user_queue)))
+                    ]
+                    future = executor.submit(self._process, user, photos, stages=stages, **kwargs)
+                    in_flight[future] = (user_id, len(photos))
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    user_id, count = in_flight.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        # The photos stay pending and are picked up again on the next poll
+                        self.logger.exception(f"Failed to process photos for user {user_id}")
+                        queues[user_id].clear()
+                        continue
+
+                    processed += count
+                    self.logger.info(
+                        f"User {user_id}: {count} photos processed, "
+                        f"{len(queues[user_id])} remaining ({processed}/{total} overall)"
+                    )
+                    if queues[user_id]:
+                        ready.append(user_id)
+
+        return processed
+
+    def run_forever(self, poll_interval: float = 30.0, **kwargs):
+        while True:
+            processed = self.run_once(**kwargs)
+            if processed == 0:
+                time.sleep(poll_interval)
+
+    def run(self):
+        parser = argparse.ArgumentParser(description="Multi-user pipeline scheduler")
+        parser.add_argument(
+            "--max-concurrent",
+            type=int,
+            default=2,
+            help="Maximum number of user slices processed at the same time",
+        )
+        parser.add_argument(
+            "--slice-size",
+            type=int,
+            default=64,
+            help="Photos taken from one user before moving on to the next",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=30.0,
+            help="Seconds to wait before looking for new photos when nothing is pending",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Process everything pending once and exit"
+        )
+        self.runner.add_pipeline_arguments(parser)
+        args = vars(parser.parse_args())
+
+        self.max_concurrent = args.pop("max_concurrent")
+        self.slice_size = args.pop("slice_size")
+        poll_interval = args.pop("poll_interval")
+        if args.pop("once"):
+            self.run_once(**args)
+        else:
+            self.run_forever(poll_interval=poll_interval, **args)
+
+
+if __name__ == "__main__":
+    scheduler = PipelineScheduler()
+    scheduler.run()
@@ -4,3 +4,4 @@ from routers.dependencies.auth_jwt import (
     create_jwt_token,
 )
 from routers.dependencies.db_dependency import get_db_connection
+from routers.dependencies.search_dependency import get_search_engine
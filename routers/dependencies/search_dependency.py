@@ -0,0 +1,36 @@
+import logging
+import threading
+
+from fastapi import HTTPException, Request, status
+
+from core.search.llm_search import LLMSearch
+from core.search.prompt_library.types import AdapterType
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+_search_engine_lock = threading.Lock()
+
+
+def create_search_engine() -> LLMSearch:
+    search_engine = LLMSearch(
+        settings=Settings(), adapter_type=AdapterType.COHERE, model="command-r"
+    )
+    search_engine.warmup()
+    return search_engine
+
+
+def get_search_engine(request: Request) -> LLMSearch:
+    # Built at startup, or on the first search when startup could not build it
+    state = request.app.state
+    if getattr(state, "search_engine", None) is None:
+        with _search_engine_lock:
+            if getattr(state, "search_engine", None) is None:
+                try:
+                    state.search_engine = create_search_engine()
+                except Exception:
+                    logger.exception("Search engine could not be created")
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Search is unavailable",
+                    )
+    return state.search_engine
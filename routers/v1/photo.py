@@ -8,6 +8,7 @@ from routers.dependencies.auth_jwt import get_current_user
 from routers.dependencies.db_dependency import get_db_connection
 from routers.dependencies.datastore_dependency import get_datastore
 from handlers.photo_handler import PhotoHandler
+from handlers.photo_job_handler import PhotoJobHandler
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
@@ -20,6 +21,7 @@ async def upload_photo(
     datastore: BaseDataStore = Depends(get_datastore),
 ):
     handler = PhotoHandler(db_conn)
+    job_handler = PhotoJobHandler(db_conn)
     uploaded_photos = []
 
     for file in files:
@@ -45,8 +47,10 @@ async def upload_photo(
 
         await file.seek(0)
         file_content = await file.read()
-        photo = await handler.create_with_file(file_content, photo, user)
-        uploaded_photos.append(photo)
+        response = await handler.create_with_file(file_content, photo, user)
+        # Picked up by pipeline/queue_worker.py so the photo is tagged within seconds
+        await job_handler.enqueue(photo)
+        uploaded_photos.append(response)
 
     return uploaded_photos
 
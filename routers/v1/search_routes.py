@@ -1,18 +1,27 @@
 from fastapi import APIRouter, Depends
 
+from core.embed.clip import text_embedding_cache
 from core.search.llm_search import LLMSearch
-from core.search.prompt_library.types import AdapterType
+from core.search.prompt_library import prompt_cache
 from routers.dependencies.auth_jwt import get_current_user
-from settings import Settings
-
+from routers.dependencies.search_dependency import get_search_engine
 
 router = APIRouter(prefix="/search", tags=["search"])
-settings = Settings()
+
 
 @router.get("/q/{query}")
-async def search(query: str, user=Depends(get_current_user)):
-    llm_search = LLMSearch(
-        user=user, settings=settings, adapter_type=AdapterType.COHERE, model="command-r"
-    )
-    result = await llm_search.search(query, k=5)
+async def search(
+    query: str,
+    user=Depends(get_current_user),
+    search_engine: LLMSearch = Depends(get_search_engine),
+):
+    result = await search_engine.search(query, user, k=5)
     return result
+
+
+@router.get("/stats")
+async def stats(user=Depends(get_current_user)):
+    return {
+        "prompt_cache": prompt_cache.stats(),
+        "clip_text_cache": text_embedding_cache.stats(),
+    }
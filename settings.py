@@ -7,7 +7,7 @@ from rich.console import Console
 from rich.table import Table
 
 from datastore import BaseDataStore, DATASTORE_MAP
-from types_ import DatastoreType, DBType, LogLevel
+from types_ import DatastoreType, DBType, InferenceBackend, InferencePrecision, LogLevel
 
 
 class Singleton(type):
@@ -71,6 +71,25 @@ class StorageSettings:
             raise ValueError(f"Unsupported datastore type: {self.datastore}")
 
 
+@dataclass
+class InferenceSettings:
+    scene: InferenceBackend = InferenceBackend.EAGER
+    face: InferenceBackend = InferenceBackend.EAGER
+    clip: InferenceBackend = InferenceBackend.EAGER
+    precision: InferencePrecision = InferencePrecision.FP32
+    cache_dir: str = os.environ.get("MODEL_CACHE_DIR", "data/models")
+    num_threads: int = 0
+
+    def __post_init__(self):
+        self.scene = InferenceBackend(self.scene)
+        self.face = InferenceBackend(self.face)
+        self.clip = InferenceBackend(self.clip)
+        self.precision = InferencePrecision(self.precision)
+
+    def dict(self):
+        return asdict(self)
+
+
 @dataclass
 class AppConfig:
     debug: bool = False
@@ -85,6 +104,7 @@ class Settings(metaclass=Singleton):
         self.db = DBSettings()
         self.storage = StorageSettings()
         self.app = AppConfig()
+        self.inference = InferenceSettings()
         self.load()
 
     def load(self):
@@ -101,6 +121,10 @@ class Settings(metaclass=Singleton):
                             self.storage.gcloud.bucket_name = values["gcloud"]["bucket_name"]
                         if not os.environ.get("GCLOUD_PROJECT_ID"):
                             self.storage.gcloud.project_id = values["gcloud"]["project_id"]
+                    elif section == "inference":
+                        if os.environ.get("MODEL_CACHE_DIR"):
+                            values.pop("cache_dir", None)
+                        self.inference = InferenceSettings(**{**self.inference.dict(), **values})
                     else:
                         for key, value in values.items():
                             setattr(getattr(self, section), key, value)
@@ -110,6 +134,7 @@ class Settings(metaclass=Singleton):
             "db": self.db.dict(),
             "storage": self.storage.dict(),
             "app": self.app.dict(),
+            "inference": self.inference.dict(),
         }
         with open("settings.json", "w") as f:
             json.dump(data, f, indent=4)
@@ -140,3 +165,5 @@ class Settings(metaclass=Singleton):
                     console.print(create_table(title, value))
         if setting_type is None or setting_type == "app":
             console.print(create_table("Application Settings", self.app.dict()))
+        if setting_type is None or setting_type == "inference":
+            console.print(create_table("Inference Settings", self.inference.dict()))
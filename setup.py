@@ -10,7 +10,10 @@ from settings import (
     AppConfig,
     LocalStoreSettings,
     GCloudStoreSettings,
+    InferenceSettings,
     DBType,
+    InferenceBackend,
+    InferencePrecision,
     DatastoreType,
     LogLevel,
     StorageSettings,
@@ -212,11 +215,70 @@ def setup_app(
     console.print(create_table("Application Settings", settings.app.dict()))
 
 
+@app.command()
+def setup_inference(
+    scene: Annotated[
+        Optional[InferenceBackend],
+        typer.Option(help="Scene detector backend: eager, onnx or torchscript"),
+    ] = settings.inference.scene,
+    face: Annotated[
+        Optional[InferenceBackend],
+        typer.Option(help="Face embedder backend: eager or onnx"),
+    ] = settings.inference.face,
+    clip: Annotated[
+        Optional[InferenceBackend],
+        typer.Option(help="CLIP encoder backend: eager, onnx or torchscript"),
+    ] = settings.inference.clip,
+    precision: Annotated[
+        Optional[InferencePrecision],
+        typer.Option(help="Scene and face model precision: fp32 or int8, int8 always runs on onnx"),
+    ] = settings.inference.precision,
+    cache_dir: Annotated[
+        Optional[Path],
+        typer.Option(help="Directory for exported models", envvar="MODEL_CACHE_DIR"),
+    ] = Path(settings.inference.cache_dir),
+    num_threads: Annotated[
+        Optional[int],
+        typer.Option(help="ONNX Runtime intra-op threads, 0 lets the runtime decide"),
+    ] = settings.inference.num_threads,
+    interactive: Annotated[
+        bool,
+        typer.Option("--interactive", "-i", help="Use interactive prompts"),
+    ] = False,
+):
+    """Setup inference backend settings."""
+    if interactive:
+        choices = Choice([e.value for e in InferenceBackend])
+        scene = typer.prompt("Scene detector backend", default=scene, type=choices)
+        face = typer.prompt(
+            "Face embedder backend",
+            default=face,
+            type=Choice([InferenceBackend.EAGER.value, InferenceBackend.ONNX.value]),
+        )
+        clip = typer.prompt("CLIP encoder backend", default=clip, type=choices)
+        precision = typer.prompt(
+            "Scene and face model precision",
+            default=precision,
+            type=Choice([e.value for e in InferencePrecision]),
+        )
+
+    settings.inference = InferenceSettings(
+        scene=InferenceBackend(scene),
+        face=InferenceBackend(face),
+        clip=InferenceBackend(clip),
+        precision=InferencePrecision(precision),
+        cache_dir=str(cache_dir),
+        num_threads=num_threads,
+    )
+    settings.save()
+    console.print(create_table("Inference Settings", settings.inference.dict()))
+
+
 @app.command()
 def show_settings(
     setting_type: Optional[str] = typer.Option(
         None,
-        help="Type of settings to show: 'db', 'storage', 'app', or leave empty for all",
+        help="Type of settings to show: 'db', 'storage', 'app', 'inference', or leave empty for all",
     )
 ):
     """Display current settings."""
@@ -229,6 +291,7 @@ def setup():
     setup_db(interactive=True)
     setup_storage(interactive=True)
     setup_app(interactive=True)
+    setup_inference(interactive=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+parity = pytest.importorskip("benchmarks.backend_parity")
+
+from core.detect.scene import WEIGHTS_URL  # noqa: E402
+from core.embed.clip import pickle_path  # noqa: E402
+
+
+def _weights_present(model: str) -> bool:
+    # Weights are never downloaded here, the check only runs where the models are already cached
+    if model == "scene":
+        name = os.path.basename(WEIGHTS_URL)
+        return os.path.exists(os.path.join(torch.hub.get_dir(), "checkpoints", name))
+    if model == "face":
+        home = os.environ.get("DEEPFACE_HOME", os.path.expanduser("~"))
+        return os.path.exists(os.path.join(home, ".deepface", "weights", "facenet512_weights.h5"))
+    return os.path.exists(pickle_path)
+
+
+@pytest.fixture(scope="module")
+def images():
+    return parity.load_images(None, 4, seed=0)
+
+
+@pytest.mark.parametrize(
+    "model, backend",
+    [(model, backend) for model, backends in parity.BACKENDS.items() for backend in backends],
+    ids=lambda value: getattr(value, "value", value),
+)
+def test_exported_backend_matches_eager(model, backend, images):
+    if not _weights_present(model):
+        pytest.skip(f"{model} weights are not available")
+
+    result = parity.CHECKS[model](images, backend)
+    assert parity.passes(result), result
@@ -11,6 +11,24 @@ class DatastoreType(str, Enum):
     GCLOUD = "gcloud"
 
 
+class InferenceBackend(str, Enum):
+    EAGER = "eager"
+    ONNX = "onnx"
+    TORCHSCRIPT = "torchscript"
+
+
+class InferencePrecision(str, Enum):
+    FP32 = "fp32"
+    INT8 = "int8"
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class LogLevel(str, Enum):
     DEBUG = "DEBUG"
     INFO = "INFO"